@@ -0,0 +1,23 @@
+import copy
+import pytest
+from txgcv.base import Algorithm
+
+
+def _algorithm_classes(cls=Algorithm):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _algorithm_classes(sub)
+
+
+@pytest.fixture(autouse=True)
+def restore_parameters():
+    """Parameters are shared by all instances of an algorithm class, their
+    values are restored after every test so that tests do not leak settings"""
+    saved = {
+        cls: {key: copy.deepcopy(param.value) for key, param in cls._param_dict.items()}
+        for cls in _algorithm_classes()
+    }
+    yield
+    for cls, values in saved.items():
+        for key, value in values.items():
+            cls._param_dict[key].value = value
@@ -1,4 +1,5 @@
-from typing import Tuple, Union, Any, Type
+import copy
+from typing import Tuple, Union, Any, Type, Sequence
 
 
 num = Union[float, int]
@@ -13,17 +14,21 @@ def range_check(val: Any, val_type: Any, val_range: Tuple[num, num]) -> bool:
     if val is None or val_range is None:
         return True
     if isinstance(val_type, str) and "LIST" in val_type:
-        for i in val:
-            if i < val_range[0] or i > val_range[1]:
-                return False
-            else:
-                return True
+        return all(i >= val_range[0] and i <= val_range[1] for i in val)
     elif val >= val_range[0] and val <= val_range[1]:
         return True
     else:
         return False
 
 
+def option_check(val: Any, options: Sequence[Any]) -> bool:
+    if options is None:
+        return True
+    if isinstance(val, (list, tuple)):
+        return all(i in options for i in val)
+    return val in options
+
+
 class Parameter(object):
     def __init__(
         self,
@@ -44,6 +49,13 @@ class Parameter(object):
         for key, val in kwargs.items():
             self._attr_dict[key] = val
 
+    def copy(self) -> "Parameter":
+        """Independent parameter with the same value and attributes"""
+        attr = copy.deepcopy(self._attr_dict)
+        return Parameter(
+            attr.pop("value"), attr.pop("type"), attr.pop("range"), attr.pop("info"), **attr
+        )
+
     def __getattr__(self, name):
         if name in self.__dict__:
             return self.__dict__[name]
@@ -58,9 +70,11 @@ class Parameter(object):
             raise e
 
     def __setattr__(self, name, value):
-        if name is "value":
+        if name == "value":
             if not type_check(value, self._attr_dict["type"]):
                 raise TypeError(f"{value} is not of the proper parameter type")
+            if not option_check(value, self._attr_dict.get("options")):
+                raise ValueError(f"{value} is not one of {self._attr_dict['options']}")
             if not range_check(
                 value, self._attr_dict["type"], self._attr_dict["range"]
             ):
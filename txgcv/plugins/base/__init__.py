@@ -1,4 +1,5 @@
 from txgcv.plugins.base.widgets import ParameterEditBox
+from txgcv.plugins.base.lazy import LazyColorDeconv, LazyDeconvLevel
 
 
-__all__ = ["ParameterEditBox"]
\ No newline at end of file
+__all__ = ["ParameterEditBox", "LazyColorDeconv", "LazyDeconvLevel"]
@@ -0,0 +1,147 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from txgcv.segmentation import ColorDeconvSvd
+
+
+class LazyColorDeconv(object):
+    """On demand, tile wise color deconvolution of an image pyramid
+
+    The pyramid levels are strided views of the image, every tile is
+    deconvolved with the fitted stain matrix of ``algo`` only when a layer
+    requests it, and the results are kept in an LRU tile cache shared by the
+    hematoxylin and eosin layers. Tiles are deconvolved by a snapshot of
+    ``algo``, so changing its parameters or fitting it again later does not
+    change the layers already shown.
+    """
+
+    def __init__(
+        self,
+        algo: ColorDeconvSvd,
+        tile_size: int = 512,
+        cache_size: int = 256,
+        min_level_size: int = 512,
+    ) -> None:
+        if algo.stain_matrix is None:
+            raise ValueError("stain matrix is not fitted yet, call fit first")
+        self._algo = algo.snapshot()
+        self._tile_size = tile_size
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, int, int], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        algo = self._algo
+        img = algo.image
+        self._levels = [img]
+        while max(self._levels[-1].shape[:2]) > min_level_size:
+            factor = 2 ** len(self._levels)
+            self._levels.append(img[::factor, ::factor])
+
+        # deconvolve a single pixel to learn the output modes, shapes and dtypes
+        sample = self._as_dict(algo.transform(img[:1, :1]))
+        self._meta = {mode: (pair[0].ndim, pair[0].dtype) for mode, pair in sample.items()}
+
+    @property
+    def modes(self) -> List[str]:
+        return list(self._meta.keys())
+
+    def layer_data(self, mode: str, stain_idx: int) -> List["LazyDeconvLevel"]:
+        """Multiscale data of one stain (0 hematoxylin, 1 eosin) and output mode"""
+        ndim, dtype = self._meta[mode]
+        return [
+            LazyDeconvLevel(self, level, mode, stain_idx, ndim, dtype)
+            for level in range(len(self._levels))
+        ]
+
+    def _as_dict(self, result) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        if isinstance(result, dict):
+            return result
+        return {self._algo.parameter["output_mode"].value: result}
+
+    def _tile(self, level: int, ty: int, tx: int) -> dict:
+        key = (level, ty, tx)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        size = self._tile_size
+        img = self._levels[level][ty * size:(ty + 1) * size, tx * size:(tx + 1) * size]
+        result = self._as_dict(self._algo.transform(np.ascontiguousarray(img)))
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _region(
+        self, level: int, mode: str, stain_idx: int, y0: int, y1: int, x0: int, x1: int
+    ) -> np.ndarray:
+        ndim, dtype = self._meta[mode]
+        size = self._tile_size
+        out = np.empty((y1 - y0, x1 - x0) + (3,) * (ndim - 2), dtype=dtype)
+        for ty in range(y0 // size, (y1 - 1) // size + 1):
+            for tx in range(x0 // size, (x1 - 1) // size + 1):
+                tile = self._tile(level, ty, tx)[mode][stain_idx]
+                ty0, tx0 = ty * size, tx * size
+                sy0, sy1 = max(y0, ty0), min(y1, ty0 + tile.shape[0])
+                sx0, sx1 = max(x0, tx0), min(x1, tx0 + tile.shape[1])
+                out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = tile[
+                    sy0 - ty0:sy1 - ty0, sx0 - tx0:sx1 - tx0
+                ]
+        return out
+
+
+class LazyDeconvLevel(object):
+    """Array like view of one pyramid level, computed tile by tile on indexing"""
+
+    def __init__(
+        self,
+        source: LazyColorDeconv,
+        level: int,
+        mode: str,
+        stain_idx: int,
+        ndim: int,
+        dtype: np.dtype,
+    ) -> None:
+        self._source = source
+        self._level = level
+        self._mode = mode
+        self._stain_idx = stain_idx
+        h, w = source._levels[level].shape[:2]
+        self.shape = (h, w) + (3,) * (ndim - 2)
+        self.dtype = dtype
+        self.ndim = ndim
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        arr = self[:, :]
+        return arr if dtype is None else arr.astype(dtype)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1:]
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        bounds, local = [], []
+        for k, n in zip(key[:2], self.shape[:2]):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step > 0 and stop > start:
+                    bounds.append((start, stop))
+                    local.append(slice(None, None, step))
+                else:
+                    bounds.append((0, n))
+                    local.append(k)
+            else:
+                k = int(k) % n
+                bounds.append((k, k + 1))
+                local.append(0)
+        (y0, y1), (x0, x1) = bounds
+        region = self._source._region(self._level, self._mode, self._stain_idx, y0, y1, x0, x1)
+        return region[tuple(local) + key[2:]]
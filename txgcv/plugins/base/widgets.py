@@ -1,4 +1,4 @@
-from qtpy.QtWidgets import QWidget, QLineEdit, QHBoxLayout, QLabel, QMessageBox
+from qtpy.QtWidgets import QWidget, QLineEdit, QComboBox, QHBoxLayout, QLabel, QMessageBox
 from txgcv.base import Parameter
 
 
@@ -6,15 +6,22 @@ class ParameterEditBox(QWidget):
 
     def __init__(self, name: str, para: Parameter, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        if para.type not in ["LIST_OF_INT", "LIST_OF_FLOAT", int, float]:
+        if para.type not in ["LIST_OF_INT", "LIST_OF_FLOAT", "LIST_OF_STR", int, float, str]:
             raise ValueError(f"{self.__class__.__name__} does not support parameter of type {para.type}")
         self._parameter = para
         self._name = name
-        self.value_input = QLineEdit(self)
+        options = getattr(self._parameter, "options", None)
+        if options is not None and self._parameter.type != "LIST_OF_STR":
+            self.value_input = QComboBox(self)
+            self.value_input.addItems(list(map(str, options)))
+            self.value_input.setCurrentText(str(self._parameter.value))
+            self.value_input.currentTextChanged.connect(self._update_option)
+        else:
+            self.value_input = QLineEdit(self)
+            self._set_text()
+            self.value_input.editingFinished.connect(self._update_value)
         if self._parameter.info is not None:
             self.value_input.setToolTip(self._parameter.info)
-        self._set_text()
-        self.value_input.editingFinished.connect(self._update_value)
 
         layout = QHBoxLayout(self)
         self.value_input.setMaximumWidth(70)
@@ -31,15 +38,20 @@ class ParameterEditBox(QWidget):
     
     def _update_value(self):
         text = self.value_input.text()
+        items = [item.strip() for item in text.split(",") if item.strip()]
         try:
             if self._parameter.type == "LIST_OF_INT":
-                self._parameter.value = list(map(int, text.split(",")))
+                self._parameter.value = list(map(int, items))
             elif self._parameter.type == "LIST_OF_FLOAT":
-                self._parameter.value = list(map(float, text.split(",")))
+                self._parameter.value = list(map(float, items))
+            elif self._parameter.type == "LIST_OF_STR":
+                self._parameter.value = items
             elif self._parameter.type is float:
                 self._parameter.value = float(text)
             elif self._parameter.type is int:
                 self._parameter.value = int(text)
+            elif self._parameter.type is str:
+                self._parameter.value = text
         except Exception as e:
             self._set_text()
             msg = QMessageBox(self)
@@ -49,3 +61,6 @@ class ParameterEditBox(QWidget):
             msg.setInformativeText(f"{text} is illegal for the parameter.<br>" + str(e))
             msg.setStandardButtons(QMessageBox.Ok)
             msg.show()
+
+    def _update_option(self, text):
+        self._parameter.value = text
@@ -1,6 +1,3 @@
-import numpy as np
-from skimage import io
-
 from qtpy.QtWidgets import (
     QWidget,
     QPushButton,
@@ -12,7 +9,8 @@ from qtpy.QtWidgets import (
 from napari_plugin_engine import napari_hook_implementation
 from napari.qt.threading import thread_worker
 from txgcv.segmentation import ColorDeconvSvd
-from txgcv.plugins.base import ParameterEditBox
+from txgcv.plugins.base import ParameterEditBox, LazyColorDeconv
+from txgcv.util import ImageSource, load_image
 
 
 @napari_hook_implementation(specname="napari_experimental_provide_dock_widget")
@@ -55,18 +53,32 @@ class ColorDeconvSvdWidget(QWidget):
         else:
             return
         img = self._load_img(filename)
-        self._algo.set_image(img)
-        self._viewer.add_image(img, name="H&E Image")
-        
-    def _load_img(self, filename: str) -> np.array:
-        img = io.imread(filename).astype(np.float32)
-        img = 255 * img / np.max(img)
-        shape = img.shape
-        if len(shape) == 3:
-            if shape[2] <= 3:
-                img = np.swapaxes(img, 1, 2)
-                img = np.swapaxes(img, 0, 1)
-        return img
+        self._viewer.add_image(
+            img.layer_data,
+            name="H&E Image",
+            multiscale=img.multiscale,
+            contrast_limits=img.contrast_limits,
+        )
+
+        def set_image(decoded):
+            self._algo.set_image(decoded)
+            self._deconv_button.setEnabled(True)
+
+        def failed(error):
+            self._deconv_button.setEnabled(True)
+
+        @thread_worker(connect={"returned": set_image, "errored": failed})
+        def decode():
+            # 8 bit memory maps are used as they are, compressed levels are
+            # decoded here off the GUI thread once the layer is shown
+            return img.normalized()
+
+        self._deconv_button.setEnabled(False)
+        decode()
+
+    def _load_img(self, filename: str) -> ImageSource:
+        # opened once per process and file version, reloading is instant
+        return load_image(filename)
 
     def _show_parameter(self):
         self._para_container = QWidget()
@@ -84,13 +96,22 @@ class ColorDeconvSvdWidget(QWidget):
         self._para_container.show()
 
     def _deconv(self) -> None:
-        def show_result(image_pair):
-            self._viewer.add_image(image_pair[0], name="Hematoxylin")
-            self._viewer.add_image(image_pair[1], name="Eosin")
+        def show_result(stain_matrix):
+            lazy_deconv = LazyColorDeconv(self._algo)
+            for mode in lazy_deconv.modes:
+                suffix = "" if mode == "rgb" else f" ({mode})"
+                for stain_idx, name in enumerate(["Hematoxylin", "Eosin"]):
+                    self._viewer.add_image(
+                        lazy_deconv.layer_data(mode, stain_idx),
+                        name=name + suffix,
+                        multiscale=True,
+                        rgb=mode != "concentration",
+                    )
 
         @thread_worker(connect={"returned": show_result})
         def run():
-            hemo, eosin = self._algo.color_deconv()
-            return (hemo, eosin)
+            # only the stain basis is estimated here, tiles are deconvolved
+            # lazily when napari requests them for the current viewport
+            return self._algo.fit(sample_tile=True)
 
         run()
@@ -1,5 +1,7 @@
+import queue
+import threading
 import numpy as np
-from skimage import io
+from typing import Callable
 
 from qtpy.QtWidgets import (
     QWidget,
@@ -14,6 +16,8 @@ from napari_plugin_engine import napari_hook_implementation
 from napari._qt.qt_liveplot import QtLivePlotWidget
 from napari.qt.threading import thread_worker
 from txgcv.registration.img_regist import ImageRegister
+from txgcv.registration.telemetry import TelemetryStream
+from txgcv.util import ImageSource, load_image
 from txgcv.plugins.base import ParameterEditBox
 
 
@@ -40,12 +44,17 @@ class RegistWidget(QWidget):
         self._load_fix_button.clicked.connect(self.load_fix_image)
         self._init_button = QPushButton("Init", self)
         self._init_button.clicked.connect(self.init_registration)
+        self._auto_init_button = QPushButton("Auto Init", self)
+        self._auto_init_button.clicked.connect(self.auto_init_registration)
         self._regist_button = QPushButton("Register", self)
         self._regist_button.clicked.connect(self.run_registration)
         line_style = dict(marker_size=8, color="w", edge_color="w", face_color="w",)
         self._loss_plot = QtLivePlotWidget(
             vertical=False, line_style=line_style, axis_kwargs={'tick_font_size': 4}
         )
+        self._loss_index = np.zeros(0, dtype=int)
+        self._loss_metric = np.zeros(0)
+        self._num_decoding = 0
 
         control_panel = QWidget()
         control_layout = QHBoxLayout()
@@ -53,6 +62,7 @@ class RegistWidget(QWidget):
         control_layout.addWidget(self._load_mv_button)
         control_layout.addWidget(self._load_fix_button)
         control_layout.addWidget(self._init_button)
+        control_layout.addWidget(self._auto_init_button)
         control_layout.addWidget(self._regist_button)
         control_panel.setLayout(control_layout)
         layout.addWidget(control_panel)
@@ -70,9 +80,9 @@ class RegistWidget(QWidget):
             return
         moving_img = self._load_img(filename)
 
-        self._register.set_moving_img(moving_img)
         estimate_pt_size = np.max(moving_img.shape) * 0.005
-        self._viewer.add_image(moving_img, name="Moving Image")
+        self._add_image(moving_img, "Moving Image")
+        self._decode_img(moving_img, self._register.set_moving_img)
         self._viewer.add_points(face_color="red", name="Moving Points", size=estimate_pt_size)
         
     def load_fix_image(self) -> None:
@@ -84,21 +94,49 @@ class RegistWidget(QWidget):
         else:
             return
         fixed_img = self._load_img(filename)
-        self._register.set_fixed_img(fixed_img)
 
         estimate_pt_size = np.max(fixed_img.shape) * 0.005
-        self._viewer.add_image(fixed_img, name="Fixed Image")
+        self._add_image(fixed_img, "Fixed Image")
+        self._decode_img(fixed_img, self._register.set_fixed_img)
         self._viewer.add_points(face_color="blue", name="Fixed Points", size=estimate_pt_size)
 
-    def _load_img(self, filename: str) -> np.array:
-        img = io.imread(filename).astype(np.float32)
-        img = 255 * img / np.max(img)
-        shape = img.shape
-        if len(shape) == 3:
-            if shape[2] <= 3:
-                img = np.swapaxes(img, 1, 2)
-                img = np.swapaxes(img, 0, 1)
-        return img
+    def _load_img(self, filename: str) -> ImageSource:
+        # opened once per process and file version, reloading is instant
+        return load_image(filename)
+
+    def _add_image(self, img: ImageSource, name: str) -> None:
+        # the raw (memory mapped or lazily decoded) levels are shown, the
+        # normalization is applied through the contrast limits
+        self._viewer.add_image(
+            img.layer_data,
+            name=name,
+            multiscale=img.multiscale,
+            contrast_limits=img.contrast_limits,
+        )
+
+    def _decode_img(self, img: ImageSource, set_img: Callable[[np.ndarray], None]) -> None:
+        # compressed levels are decoded off the GUI thread once the layer is
+        # shown, initialization and registration wait until they are set
+        def returned(decoded):
+            set_img(decoded)
+            finished()
+
+        def finished(*args):
+            self._num_decoding -= 1
+            self._set_run_enabled(self._num_decoding == 0)
+
+        @thread_worker(connect={"returned": returned, "errored": finished})
+        def decode():
+            # the float32 conversion of the register is done here as well
+            return np.ascontiguousarray(img.normalized(), dtype=np.float32)
+
+        self._num_decoding += 1
+        self._set_run_enabled(False)
+        decode()
+
+    def _set_run_enabled(self, enabled: bool) -> None:
+        for button in [self._init_button, self._auto_init_button, self._regist_button]:
+            button.setEnabled(enabled)
 
     def _show_parameter(self):
         self._para_container = QWidget()
@@ -121,25 +159,76 @@ class RegistWidget(QWidget):
 
         @thread_worker(connect={"returned": show_init})
         def init():
-            fixed_kp = self._viewer.layers["Moving Points"].data
-            moving_kp = self._viewer.layers["Fixed Points"].data
+            moving_kp = self._viewer.layers["Moving Points"].data
+            fixed_kp = self._viewer.layers["Fixed Points"].data
             
             fixed_kp = fixed_kp[:, ::-1]
             moving_kp = moving_kp[:, ::-1]
-            init_img = self._register.keypoint_initialize(moving_kp, fixed_kp)
-            return init_img
+            init_result = self._register.keypoint_initialize(moving_kp, fixed_kp)
+            return init_result.checkerboard()
     
         init()
 
+    def auto_init_registration(self) -> None:
+        def show_init(img):
+            self._viewer.add_image(img, name="Initialization")
+
+        @thread_worker(connect={"returned": show_init})
+        def init():
+            init_result = self._register.feature_initialize()
+            return init_result.checkerboard()
+
+        init()
+
     def run_registration(self) -> None:
         def final_registration(img):
             self._viewer.add_image(img, name="Registered Image")
 
-        @thread_worker(connect={"returned": final_registration})
+        self._loss_index = np.zeros(0, dtype=int)
+        self._loss_metric = np.zeros(0)
+
+        @thread_worker(
+            connect={"yielded": self._update_loss_plot, "returned": final_registration}
+        )
         def run():
-            result = self._register.regist(live_optimize_plot_handle=self._loss_plot.set_data)
-            return result
+            # registration runs in its own thread, rate limited telemetry deltas
+            # are passed through the queue and yielded to the GUI thread
+            updates = queue.Queue()
+            result = {}
+
+            def target():
+                try:
+                    result["value"] = self._register.regist(
+                        live_optimize_plot_handle=TelemetryStream(updates.put, max_rate=10)
+                    )
+                except Exception as e:
+                    result["error"] = e
+                finally:
+                    updates.put(None)
+
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            while True:
+                delta = updates.get()
+                if delta is None:
+                    break
+                yield delta
+            thread.join()
+            if "error" in result:
+                raise result["error"]
+            return result["value"].checkerboard()
+
         try:
             run()
         except Exception as e:
-            print(str(e))
\ No newline at end of file
+            print(str(e))
+
+    def _update_loss_plot(self, delta, max_points: int = 500) -> None:
+        self._loss_index = np.concatenate([self._loss_index, delta["index"]])
+        self._loss_metric = np.concatenate([self._loss_metric, delta["metric"]])
+        idx = np.unique(
+            np.linspace(0, len(self._loss_index) - 1, min(len(self._loss_index), max_points))
+            .round()
+            .astype(int)
+        )
+        self._loss_plot.set_data((self._loss_index[idx], self._loss_metric[idx]))
@@ -1,3 +1,21 @@
 from txgcv.registration.img_regist import ImageRegister
+from txgcv.registration.result import RegistResult
+from txgcv.registration.cache import RegistCache
+from txgcv.registration.transform import save_transform, load_transform, apply_transform
+from txgcv.registration.pyramid import PyramidRegister
+from txgcv.registration.batch import batch_regist
+from txgcv.registration.stack import StackRegister, StackResult, compose_to_reference
 
-__all__ = ["ImageRegister"]
\ No newline at end of file
+__all__ = [
+    "ImageRegister",
+    "PyramidRegister",
+    "RegistResult",
+    "RegistCache",
+    "save_transform",
+    "load_transform",
+    "apply_transform",
+    "batch_regist",
+    "StackRegister",
+    "StackResult",
+    "compose_to_reference",
+]
@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import SimpleITK as sitk
+from txgcv.registration import RegistCache, batch_regist
+from txgcv.registration.telemetry import RegistTelemetry
+
+
+_PARAM = {
+    "num_iter": 100,
+    "sampling_strategy": "none",
+    "shrink_factor": [2, 1],
+    "smooth_sigma": [1, 0],
+}
+
+
+def _images(shifts, seed=0):
+    # smooth fixed image and copies of it shifted by (dx, dy) pixels
+    rng = np.random.default_rng(seed)
+    img = sitk.SmoothingRecursiveGaussian(
+        sitk.GetImageFromArray(rng.uniform(0, 255, (64, 72)).astype(np.float32)), 3.0
+    )
+    moving = [
+        sitk.GetArrayFromImage(
+            sitk.Resample(img, sitk.TranslationTransform(2, (-dx, -dy)), sitk.sitkLinear)
+        )
+        for dx, dy in shifts
+    ]
+    return (sitk.GetArrayFromImage(img), moving)
+
+
+def test_batch_regist_streams_results(tmp_path):
+    shifts = [(2.0, -1.0), (-1.5, 2.5)]
+    fixed, moving = _images(shifts)
+    cache_dir = str(tmp_path / "cache")
+    results = list(
+        batch_regist(fixed, moving, num_workers=2, param_dict=_PARAM, cache_dir=cache_dir)
+    )
+    assert sorted(index for index, _, _ in results) == [0, 1]
+    for index, transform, metrics in results:
+        # the transform maps fixed points onto the shifted moving points
+        np.testing.assert_allclose(
+            transform.TransformPoint((30.0, 30.0)),
+            np.add((30.0, 30.0), shifts[index]),
+            atol=0.2,
+        )
+        assert set(metrics) == {"metric", "num_iter", "telemetry"}
+        assert 0 < metrics["num_iter"] <= 200
+        assert np.isfinite(metrics["metric"])
+
+    # entries of the shared cache are returned instead of registering again
+    cache = RegistCache(cache_dir)
+    names = [name for name in os.listdir(cache_dir) if name.endswith(".npz")]
+    assert len(names) == 2
+    marker = sitk.TranslationTransform(2, (100.0, 100.0))
+    for name in names:
+        cache.put(name[: -len(".npz")], marker, RegistTelemetry(capacity=1))
+    for _, transform, _ in batch_regist(
+        fixed, moving, num_workers=2, param_dict=_PARAM, cache_dir=cache_dir
+    ):
+        np.testing.assert_allclose(transform.TransformPoint((0.0, 0.0)), (100.0, 100.0))
+
+
+def test_batch_regist_empty():
+    fixed, _ = _images([])
+    assert list(batch_regist(fixed, [])) == []
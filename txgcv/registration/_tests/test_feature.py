@@ -0,0 +1,67 @@
+import time
+import numpy as np
+import pytest
+import SimpleITK as sitk
+from skimage import data
+from txgcv.registration import ImageRegister
+from txgcv.registration.feature import match_features
+
+
+_ANGLE, _SCALE, _SHIFT = 0.3, 1.1, (40.0, -30.0)
+
+
+@pytest.fixture(scope="module")
+def images():
+    # 2048 x 2048 fixed image and the moving image of a known similarity,
+    # features are matched on 4 times downsampled thumbnails
+    small = sitk.GetImageFromArray(data.camera().astype(np.float32))
+    small.SetSpacing((4.0, 4.0))
+    small.SetOrigin((1.5, 1.5))
+    grid = sitk.Image(2048, 2048, sitk.sitkFloat32)
+    fixed = sitk.Resample(small, grid, sitk.Transform(), sitk.sitkLinear)
+    transform = sitk.Similarity2DTransform()
+    transform.SetCenter((1023.5, 1023.5))
+    transform.SetAngle(_ANGLE)
+    transform.SetScale(_SCALE)
+    transform.SetTranslation(_SHIFT)
+    # the transform maps fixed points onto the moving image
+    moving = sitk.Resample(fixed, grid, transform.GetInverse(), sitk.sitkLinear)
+    return (sitk.GetArrayFromImage(moving), sitk.GetArrayFromImage(fixed), transform)
+
+
+def test_feature_initialize_recovers_similarity(images):
+    moving, fixed, expected = images
+    register = ImageRegister(moving, fixed)
+    register.feature_initialize()  # the first call imports skimage.feature
+    start = time.perf_counter()
+    result = register.feature_initialize()
+    assert time.perf_counter() - start < 1.0
+
+    transform = result.transform
+    assert isinstance(transform, sitk.Similarity2DTransform)
+    assert abs(transform.GetAngle() - _ANGLE) < 2e-3
+    assert abs(transform.GetScale() - _SCALE) < 2e-3
+    points = np.random.default_rng(0).uniform(600, 1400, (20, 2))
+    for p in points:
+        np.testing.assert_allclose(
+            transform.TransformPoint(tuple(p)), expected.TransformPoint(tuple(p)), atol=2.0
+        )
+
+
+def test_feature_initialize_threshold_in_thumbnail_pixels(images):
+    moving, fixed, _ = images
+    register = ImageRegister(moving, fixed)
+    # 2 thumbnail pixels are 8 full resolution pixels, which keeps nearly all
+    # matches despite their localization error on the thumbnail
+    register.set_parameter({"ransac_threshold": 2.0})
+    result = register.feature_initialize()
+    assert result.keypoint_inlier.mean() > 0.9
+    assert np.median(result.keypoint_residual) > 1.0
+
+
+def test_match_features_without_corners():
+    blank = np.zeros((64, 64), np.float32)
+    moving_kp, fixed_kp = match_features(blank, blank)
+    assert moving_kp.shape == fixed_kp.shape == (0, 2)
+    with pytest.raises(ValueError):
+        ImageRegister(blank, blank).feature_initialize()
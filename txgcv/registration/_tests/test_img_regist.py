@@ -0,0 +1,69 @@
+import numpy as np
+import SimpleITK as sitk
+from txgcv.registration import ImageRegister
+from txgcv.registration.img_regist import _plateau
+
+
+def _images(shift=(2.0, -1.5), seed=0):
+    # smooth fixed image and a copy shifted by (dx, dy) pixels
+    rng = np.random.default_rng(seed)
+    img = sitk.SmoothingRecursiveGaussian(
+        sitk.GetImageFromArray(rng.uniform(0, 255, (96, 104)).astype(np.float32)), 3.0
+    )
+    moving = sitk.Resample(img, sitk.TranslationTransform(2, (-shift[0], -shift[1])))
+    return (sitk.GetArrayFromImage(moving), sitk.GetArrayFromImage(img))
+
+
+def _register(**param):
+    register = ImageRegister(*_images())
+    register.set_parameter(
+        {"num_iter": 40, "shrink_factor": [2, 1], "smooth_sigma": [1, 0], **param}
+    )
+    return register
+
+
+def test_random_sampling_is_reproducible():
+    register = _register(sampling_strategy="random", sampling_rate=0.2)
+    first = register.regist()
+    second = register.regist()
+    assert first.transform.GetParameters() == second.transform.GetParameters()
+    np.testing.assert_array_equal(first.telemetry.metric, second.telemetry.metric)
+    register.set_parameter({"random_seed": 7})
+    assert register.regist().transform.GetParameters() != first.transform.GetParameters()
+
+
+def test_multi_start_keeps_best_start():
+    register = _register(
+        num_start=4, num_keep=2, sampling_strategy="none", start_translation=3.0
+    )
+    result = register.regist()
+    np.testing.assert_allclose(
+        result.transform.TransformPoint((50.0, 50.0)), (52.0, 48.5), atol=0.1
+    )
+    single = _register(sampling_strategy="none").regist()
+    assert result.metric <= single.metric + 1e-6
+
+
+def test_plateau():
+    metric = np.array([-1.0, -2.0, -2.5, -2.501, -2.5015])
+    assert not _plateau(metric[:2], 2, 1e-3)
+    assert not _plateau(metric[:4], 2, 1e-3)
+    assert _plateau(metric, 2, 1e-3)
+
+
+def test_plateau_stops_level_early():
+    full = _register(sampling_strategy="none", num_iter=200).regist()
+    early = _register(
+        sampling_strategy="none", num_iter=200, plateau_window=3, plateau_tol=1e-2
+    ).regist()
+    for level in (0, 1):
+        assert np.sum(early.telemetry.level == level) < np.sum(full.telemetry.level == level)
+    np.testing.assert_allclose(
+        early.transform.TransformPoint((50.0, 50.0)), (52.0, 48.5), atol=0.5
+    )
+
+
+def test_level_num_iter_caps_each_level():
+    result = _register(sampling_strategy="none", level_num_iter=[3, 5]).regist()
+    assert np.sum(result.telemetry.level == 0) <= 3
+    assert np.sum(result.telemetry.level == 1) <= 5
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from txgcv.registration import ImageRegister
+from txgcv.registration.keypoint import estimate_similarity, similarity_to_sitk
+
+
+# z -> a * z + b: scale 1.1, 30 degree rotation
+_A = 1.1 * np.exp(1j * np.deg2rad(30))
+_B = 40 - 25j
+
+
+def _points(num_point=60, num_outlier=15, mirror=False, seed=0):
+    # (x, y) fixed points, moving points of the similarity and the inlier mask
+    rng = np.random.default_rng(seed)
+    fixed = rng.uniform(0, 200, (num_point, 2))
+    z = fixed[:, 0] + 1j * fixed[:, 1]
+    moved = _A * (np.conj(z) if mirror else z) + _B
+    moving = np.column_stack([moved.real, moved.imag])
+    inlier = np.ones(num_point, dtype=bool)
+    inlier[:num_outlier] = False
+    sign = rng.choice([-1, 1], (num_outlier, 2))
+    moving[~inlier] += rng.uniform(30, 60, (num_outlier, 2)) * sign
+    return (fixed, moving, inlier)
+
+
+@pytest.fixture
+def register():
+    return ImageRegister(np.zeros((240, 260), np.float32), np.zeros((200, 220), np.float32))
+
+
+def _transform_points(transform, points):
+    return np.array([transform.TransformPoint(tuple(p)) for p in points])
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_ransac_recovers_similarity_with_outliers(mirror):
+    fixed, moving, inlier = _points(mirror=mirror)
+    (a, b), flip, residual, found = estimate_similarity(fixed, moving, threshold=5.0)
+    assert flip == mirror
+    assert abs(a - _A) < 1e-6
+    assert abs(b - _B) < 1e-4
+    np.testing.assert_array_equal(found, inlier)
+    assert np.all(residual[inlier] < 1e-4)
+    assert np.all(residual[~inlier] > 5.0)
+
+
+def test_lstsq_is_biased_by_outliers():
+    fixed, moving, _ = _points()
+    (a, _), _, _, inlier = estimate_similarity(fixed, moving, method="lstsq", mirror="never")
+    assert abs(a - _A) > 1e-3
+    assert np.all(inlier)
+
+
+def test_mirror_never_keeps_unmirrored_model():
+    fixed, moving, _ = _points(num_outlier=0, mirror=True)
+    _, flip, residual, _ = estimate_similarity(fixed, moving, mirror="never")
+    assert not flip
+    assert residual.max() > 1.0
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_similarity_to_sitk_maps_points(mirror):
+    fixed, moving, _ = _points(num_outlier=0, mirror=mirror)
+    transform = similarity_to_sitk((_A, _B), mirror, (110.0, 100.0), (130.0, 120.0))
+    np.testing.assert_allclose(_transform_points(transform, fixed), moving, atol=1e-6)
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_keypoint_initialize_maps_fixed_onto_moving(register, mirror):
+    fixed, moving, inlier = _points(mirror=mirror)
+    register.set_parameter({"ransac_threshold": 5.0})
+    result = register.keypoint_initialize(moving, fixed)
+    # SimpleITK transforms map fixed points to moving points
+    np.testing.assert_allclose(
+        _transform_points(result.transform, fixed[inlier]), moving[inlier], atol=1e-4
+    )
+    np.testing.assert_array_equal(result.keypoint_inlier, inlier)
+    assert result.keypoint_residual.shape == (len(fixed),)
+    assert np.all(result.keypoint_residual[inlier] < 1e-4)
+    assert np.all(result.keypoint_residual[~inlier] > 5.0)
+
+
+def test_keypoint_initialize_argument_order(register):
+    fixed, moving, _ = _points(num_outlier=0)
+    swapped = register.keypoint_initialize(fixed, moving).transform
+    # swapped arguments estimate the inverse, which maps moving onto fixed
+    np.testing.assert_allclose(_transform_points(swapped, moving), fixed, atol=1e-4)
+    assert np.abs(_transform_points(swapped, fixed) - moving).max() > 1.0
+
+
+def test_keypoint_initialize_rejects_single_pair(register):
+    with pytest.raises(ValueError):
+        register.keypoint_initialize(np.zeros((1, 2)), np.zeros((1, 2)))
@@ -0,0 +1,58 @@
+import numpy as np
+import SimpleITK as sitk
+from txgcv.registration import ImageRegister, PyramidRegister
+from txgcv.registration.feature import _block_mean
+
+
+_SHIFT = (2.3, -1.7)
+
+
+def _levels(shift, seed=0):
+    # full resolution and 4x downsampled levels of a smooth fixed image and a
+    # copy shifted by (dx, dy) full resolution pixels
+    rng = np.random.default_rng(seed)
+    img = sitk.SmoothingRecursiveGaussian(
+        sitk.GetImageFromArray(rng.uniform(0, 255, (384, 384)).astype(np.float32)), 3.0
+    )
+    moving = sitk.Resample(img, sitk.TranslationTransform(2, (-shift[0], -shift[1])))
+    fixed, moving = sitk.GetArrayFromImage(img), sitk.GetArrayFromImage(moving)
+    return ([fixed, _block_mean(fixed, 4)], [moving, _block_mean(moving, 4)])
+
+
+def _full_metric(transform, fixed, moving):
+    # metric of a transform on the full resolution images
+    method = sitk.ImageRegistrationMethod()
+    method.SetMetricAsMattesMutualInformation(numberOfHistogramBins=50)
+    method.SetInterpolator(sitk.sitkLinear)
+    method.SetInitialTransform(transform)
+    return method.MetricEvaluate(
+        sitk.GetImageFromArray(fixed.astype(np.float32)),
+        sitk.GetImageFromArray(moving.astype(np.float32)),
+    )
+
+
+def test_roi_refinement_improves_coarse_registration():
+    fixed, moving = _levels(_SHIFT)
+    ImageRegister().set_parameter(
+        {"num_iter": 100, "sampling_strategy": "none", "shrink_factor": [1], "smooth_sigma": [0]}
+    )
+    register = PyramidRegister()
+    register.set_fixed_levels(fixed)
+    register.set_moving_levels(moving)
+    register.set_parameter({"max_coarse_size": 96, "num_roi": 0})
+    coarse = register.regist()
+    register.set_parameter({"num_roi": 2, "roi_level": 0, "roi_size": 96})
+    refined = register.regist()
+    assert len(register.rois) == 2 and register.roi_inlier.all()
+
+    points = [(100.0, 100.0), (280.0, 120.0), (190.0, 290.0)]
+    expected = np.add(points, _SHIFT)
+    errors = [
+        np.abs([result.transform.TransformPoint(p) for p in points] - expected).max()
+        for result in (coarse, refined)
+    ]
+    assert errors[1] < errors[0]
+    assert errors[1] < 0.05
+    assert _full_metric(refined.transform, fixed[0], moving[0]) <= _full_metric(
+        coarse.transform, fixed[0], moving[0]
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from txgcv.registration import ImageRegister
+
+
+@pytest.fixture
+def register():
+    rng = np.random.default_rng(0)
+    return ImageRegister(
+        rng.uniform(0, 1, (40, 50)).astype(np.float32),
+        rng.uniform(0, 1, (40, 50)).astype(np.float32),
+    )
+
+
+@pytest.mark.parametrize(
+    "param_dict",
+    [
+        {"ransac_threshold": 3.0},
+        {"ransac_iter": 10},
+        {"keypoint_estimator": "lstsq"},
+        {"keypoint_mirror": "never"},
+        {"feature_size": 128},
+        {"num_feature": 50},
+        {"feature_ratio": 0.5},
+        {"resample_tile_size": 256},
+        {"num_threads": 1},
+    ],
+)
+def test_regist_key_ignores_parameters_outside_optimizer(register, param_dict):
+    key = register._regist_key()
+    register.set_parameter(param_dict)
+    assert register._regist_key() == key
+
+
+@pytest.mark.parametrize(
+    "param_dict",
+    [{"num_iter": 7}, {"shrink_factor": [2, 1]}, {"random_seed": 5}, {"level_num_iter": [3]}],
+)
+def test_regist_key_follows_optimizer_parameters(register, param_dict):
+    key = register._regist_key()
+    register.set_parameter(param_dict)
+    assert register._regist_key() != key
+
+
+def test_regist_key_follows_init_transform(register):
+    key = register._regist_key()
+    register.keypoint_initialize(
+        np.array([[0.0, 0.0], [10.0, 0.0]]), np.array([[1.0, 0.0], [11.0, 0.0]])
+    )
+    assert register._regist_key() != key
+
+
+def test_keypoint_initialize_cache_follows_images(register, tmp_path):
+    register.set_cache(str(tmp_path))
+    moving_kp = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    fixed_kp = np.array([[1.0, 0.0], [11.0, 0.0], [1.0, 10.0]])
+    first = register.keypoint_initialize(moving_kp, fixed_kp).transform
+    assert register.keypoint_initialize(moving_kp, fixed_kp).transform.GetParameters() == (
+        first.GetParameters()
+    )
+    # another fixed image centers the transform elsewhere
+    register.set_fixed_img(np.zeros((80, 90), np.float32))
+    second = register.keypoint_initialize(moving_kp, fixed_kp).transform
+    assert second.GetFixedParameters() != first.GetFixedParameters()
+    np.testing.assert_allclose(second.TransformPoint((1.0, 10.0)), (0.0, 10.0), atol=1e-8)
+    assert len(list(tmp_path.iterdir())) == 2
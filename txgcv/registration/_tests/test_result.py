@@ -0,0 +1,49 @@
+import numpy as np
+import SimpleITK as sitk
+from txgcv.registration import RegistResult
+
+
+def _result():
+    rng = np.random.default_rng(0)
+    moving = rng.uniform(0, 1, (2, 40, 48)).astype(np.float32)
+    fixed = rng.uniform(0, 1, (36, 44)).astype(np.float32)
+    transform = sitk.TranslationTransform(2, (2.0, 1.0))
+    return RegistResult(transform, moving, fixed, moving_channel=1, tile_size=16)
+
+
+def test_checkerboard_is_writable_array():
+    result = _result()
+    checker = result.checkerboard(checker_pattern=4)
+    assert type(checker) is np.ndarray
+    assert checker.flags.writeable
+    assert checker.shape == (36, 44)
+    checker[0, 0] = -1
+    assert result.checkerboard(checker_pattern=4)[0, 0] != -1
+
+
+
+def test_checkerboard_alternates_fixed_and_moving():
+    result = _result()
+    checker = result.checkerboard(checker_pattern=4)
+    fixed = result.fixed()
+    moving = result.resample()[1]
+    # the 4 x 4 checkers of 9 x 11 pixels start with the fixed image
+    np.testing.assert_array_equal(checker[:9, :11], fixed[:9, :11])
+    np.testing.assert_array_equal(checker[:9, 11:22], moving[:9, 11:22])
+
+
+def test_resample_region_and_scale():
+    result = _result()
+    full = result.resample()
+    assert full.shape == (2, 36, 44)
+    region = (slice(4, 20), slice(8, 32))
+    np.testing.assert_allclose(result.resample(region=region), full[:, 4:20, 8:32], atol=1e-6)
+    assert result.resample(scale=0.5).shape == (2, 18, 22)
+
+
+def test_overlay_channels():
+    result = _result()
+    overlay = result.overlay(scale=0.5)
+    assert overlay.shape == (18, 22, 3)
+    np.testing.assert_array_equal(overlay[..., 0], overlay[..., 2])
+    assert overlay.max() <= 1.0
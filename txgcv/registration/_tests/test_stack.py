@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import SimpleITK as sitk
+from txgcv.registration import StackResult, compose_to_reference
+
+
+def _pair_transforms(num_pair=4, seed=0):
+    # random similarities, pair i maps section i onto section i + 1
+    rng = np.random.default_rng(seed)
+    transforms = []
+    for _ in range(num_pair):
+        transform = sitk.Similarity2DTransform()
+        transform.SetCenter(tuple(rng.uniform(20, 40, 2)))
+        transform.SetScale(rng.uniform(0.95, 1.05))
+        transform.SetAngle(rng.uniform(-0.2, 0.2))
+        transform.SetTranslation(tuple(rng.uniform(-5, 5, 2)))
+        transforms.append(transform)
+    return transforms
+
+
+def _chain(transforms, point):
+    for transform in transforms:
+        point = transform.TransformPoint(point)
+    return np.array(point)
+
+
+@pytest.mark.parametrize("reference", [0, 2, 4])
+def test_compose_to_reference_both_directions(reference):
+    pairs = _pair_transforms()
+    points = np.random.default_rng(1).uniform(0, 60, (20, 2))
+    for k in range(len(pairs) + 1):
+        transform = compose_to_reference(pairs, reference, k)
+        for p in points:
+            mapped = transform.TransformPoint(tuple(p))
+            if k >= reference:
+                # reference to section k along the pairs
+                expected = _chain(pairs[reference:k], tuple(p))
+                np.testing.assert_allclose(mapped, expected, atol=1e-8)
+            else:
+                # back from section k to the reference along the pairs
+                np.testing.assert_allclose(
+                    _chain(pairs[k:reference], mapped), p, atol=1e-8
+                )
+
+
+def test_compose_to_reference_is_identity_on_reference():
+    transform = compose_to_reference(_pair_transforms(), 2, 2)
+    np.testing.assert_allclose(transform.TransformPoint((3.5, 7.25)), (3.5, 7.25))
+
+
+def test_stack_result_aligns_sections(tmp_path):
+    # section k is a window of one image moved by k * (dx, dy), so a point of
+    # section k sits (dx, dy) further in section k + 1
+    base = np.random.default_rng(0).uniform(0, 1, (2, 80, 90)).astype(np.float32)
+    dx, dy = 3, 2
+    sections = [
+        base[:, 20 - k * dy:60 - k * dy, 20 - k * dx:70 - k * dx] for k in range(4)
+    ]
+    pairs = [sitk.TranslationTransform(2, (float(dx), float(dy))) for _ in range(3)]
+    result = StackResult(sections, 1, pairs, [{}] * 3, tile_size=16)
+    assert len(result) == 4
+    assert result.shape == (4, 2, 40, 50)
+
+    reference = sections[1]
+    for k, aligned in enumerate(result):
+        # the interior overlaps the reference in every section
+        np.testing.assert_allclose(
+            aligned[:, 6:-6, 9:-9], reference[:, 6:-6, 9:-9], atol=1e-5
+        )
+    stack = result.write(str(tmp_path / "stack.npy"))
+    np.testing.assert_array_equal(np.load(tmp_path / "stack.npy"), stack)
+    np.testing.assert_array_equal(stack[2], result[2])
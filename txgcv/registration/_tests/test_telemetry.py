@@ -0,0 +1,92 @@
+import numpy as np
+import SimpleITK as sitk
+from concurrent.futures import ThreadPoolExecutor
+from txgcv.registration import ImageRegister
+from txgcv.registration.telemetry import RegistTelemetry, TelemetryStream
+
+
+def _register(shift, seed=0):
+    rng = np.random.default_rng(seed)
+    img = sitk.SmoothingRecursiveGaussian(
+        sitk.GetImageFromArray(rng.uniform(0, 255, (64, 72)).astype(np.float32)), 3.0
+    )
+    moving = sitk.Resample(img, sitk.TranslationTransform(2, (-shift[0], -shift[1])))
+    register = ImageRegister(sitk.GetArrayFromImage(moving), sitk.GetArrayFromImage(img))
+    return register
+
+
+def test_telemetry_grows_beyond_capacity():
+    telemetry = RegistTelemetry(capacity=2)
+    for i in range(5):
+        telemetry.record(-float(i), i, i // 3, 0.5)
+    assert len(telemetry) == 5
+    np.testing.assert_array_equal(telemetry.metric, [0, -1, -2, -3, -4])
+    np.testing.assert_array_equal(telemetry.level, [0, 0, 0, 1, 1])
+    assert telemetry.final_metric == -4
+    assert np.all(np.diff(telemetry.wall_time) >= 0)
+    assert np.isnan(RegistTelemetry().final_metric)
+
+
+def test_telemetry_dict_round_trip():
+    telemetry = RegistTelemetry(capacity=1)
+    for i in range(3):
+        telemetry.record(i * 0.1, i, 0, 1.0)
+    restored = RegistTelemetry.from_dict(telemetry.as_dict())
+    for name in RegistTelemetry._fields:
+        np.testing.assert_array_equal(getattr(restored, name), getattr(telemetry, name))
+
+
+def test_concurrent_registrations_keep_own_telemetry():
+    ImageRegister().set_parameter({"num_iter": 20, "sampling_strategy": "none"})
+    registers = [_register((2.0, -1.0), seed=0), _register((-1.0, 1.5), seed=1)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda register: register.regist(), registers))
+    for register, result in zip(registers, results):
+        # the same registration alone records the same telemetry
+        alone = register.regist()
+        assert len(result.telemetry) == len(alone.telemetry)
+        np.testing.assert_allclose(result.telemetry.metric, alone.telemetry.metric)
+    assert results[0].telemetry is not results[1].telemetry
+
+
+def test_stream_sends_decimated_deltas():
+    telemetry = RegistTelemetry()
+    updates = []
+    stream = TelemetryStream(updates.append, max_rate=0, max_points=4)
+    for i in range(10):
+        telemetry.record(float(i), i, 0, 1.0)
+    stream(telemetry)
+    for i in range(10, 12):
+        telemetry.record(float(i), i, 0, 1.0)
+    stream.flush(telemetry)
+    stream.flush(telemetry)
+    assert len(updates) == 2
+    np.testing.assert_array_equal(updates[0]["index"], [0, 3, 6, 9])
+    np.testing.assert_array_equal(updates[0]["metric"], [0, 3, 6, 9])
+    np.testing.assert_array_equal(updates[1]["index"], [10, 11])
+    stream.reset()
+    stream.flush(telemetry)
+    assert updates[-1]["index"][0] == 0 and updates[-1]["index"][-1] == 11
+
+
+def test_stream_rate_limit():
+    telemetry = RegistTelemetry()
+    updates = []
+    stream = TelemetryStream(updates.append, max_rate=1e-3)
+    for i in range(5):
+        telemetry.record(float(i), i, 0, 1.0)
+        stream(telemetry)
+    assert len(updates) == 1
+    stream.flush(telemetry)
+    np.testing.assert_array_equal(updates[-1]["index"], [1, 2, 3, 4])
+
+
+def test_regist_streams_whole_run():
+    ImageRegister().set_parameter({"num_iter": 20, "sampling_strategy": "none"})
+    updates = []
+    result = _register((2.0, -1.0)).regist(updates.append)
+    assert updates
+    assert updates[-1]["index"][-1] == len(result.telemetry) - 1
+    np.testing.assert_array_equal(
+        updates[-1]["metric"][-1], result.telemetry.final_metric
+    )
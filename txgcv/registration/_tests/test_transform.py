@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+import SimpleITK as sitk
+from txgcv.registration import apply_transform, load_transform, save_transform
+from txgcv.registration.transform import remap_transform, rescale_transform
+
+
+def _similarity():
+    transform = sitk.Similarity2DTransform()
+    transform.SetCenter((30.0, 25.0))
+    transform.SetScale(1.05)
+    transform.SetAngle(0.2)
+    transform.SetTranslation((4.0, -3.0))
+    return transform
+
+
+def _mirrored():
+    # flip of y about the moving center applied after the similarity
+    flip = sitk.AffineTransform(2)
+    flip.SetMatrix([1.0, 0.0, 0.0, -1.0])
+    flip.SetCenter((32.0, 28.0))
+    return sitk.CompositeTransform([flip, _similarity()])
+
+
+def _transform_points(transform, points):
+    return np.array([transform.TransformPoint(tuple(p)) for p in points])
+
+
+def _points(num_point=50, seed=0):
+    return np.random.default_rng(seed).uniform(0, 120, (num_point, 2))
+
+
+def _image(h=128, w=112, seed=0):
+    # smooth image so that linear interpolation at both resolutions agrees
+    rng = np.random.default_rng(seed)
+    img = sitk.GetImageFromArray(rng.uniform(0, 255, (h, w)).astype(np.float32))
+    return sitk.GetArrayFromImage(sitk.SmoothingRecursiveGaussian(img, 3.0))
+
+
+@pytest.mark.parametrize("make_transform", [_similarity, _mirrored])
+@pytest.mark.parametrize("fixed_factor, moving_factor", [(2, 2), (2, 4), (0.5, 1)])
+def test_rescale_transform_maps_full_resolution_points(
+    make_transform, fixed_factor, moving_factor
+):
+    transform = make_transform()
+    rescaled = rescale_transform(transform, fixed_factor, moving_factor)
+    full = _points()
+    # pixel centers of a downsampled image sit at f * (x + 0.5) - 0.5
+    low = (full + 0.5) / fixed_factor - 0.5
+    expected = moving_factor * (_transform_points(transform, low) + 0.5) - 0.5
+    np.testing.assert_allclose(_transform_points(rescaled, full), expected, atol=1e-8)
+
+
+@pytest.mark.parametrize("make_transform", [_similarity, _mirrored])
+def test_remap_transform_round_trip(make_transform):
+    transform = make_transform()
+    fixed_map, moving_map = (1, (-10.0, -20.0)), (1, (-5.0, 7.0))
+    remapped = remap_transform(transform, fixed_map, moving_map)
+    points = _points()
+    np.testing.assert_allclose(
+        _transform_points(remapped, points - (10.0, 20.0)),
+        _transform_points(transform, points) - (5.0, -7.0),
+        atol=1e-8,
+    )
+    restored = remap_transform(remapped, (1, (10.0, 20.0)), (1, (5.0, -7.0)))
+    np.testing.assert_allclose(
+        _transform_points(restored, points), _transform_points(transform, points), atol=1e-8
+    )
+
+
+def test_remap_transform_translation():
+    transform = sitk.TranslationTransform(2, (3.0, -2.0))
+    remapped = remap_transform(transform, (2, 0), (2, 0))
+    assert isinstance(remapped, sitk.TranslationTransform)
+    np.testing.assert_allclose(remapped.GetOffset(), (6.0, -4.0))
+
+
+@pytest.mark.parametrize("make_transform", [_similarity, _mirrored])
+def test_apply_transform_estimated_at_half_resolution(tmp_path, make_transform):
+    moving = _image()
+    transform = make_transform()
+    output_shape = (120, 100)
+    # the same mapping resampled at full resolution in one go
+    expected = sitk.GetArrayFromImage(
+        sitk.Resample(
+            sitk.GetImageFromArray(moving),
+            sitk.Image(output_shape[::-1], sitk.sitkFloat32),
+            rescale_transform(transform, 2, 2),
+            sitk.sitkLinear,
+            0.0,
+        )
+    )
+    np.save(tmp_path / "moving.npy", moving)
+    out = apply_transform(
+        str(tmp_path / "moving.npy"),
+        transform,
+        output_shape,
+        moving_scale=2.0,
+        output_scale=2.0,
+        out_path=str(tmp_path / "out.npy"),
+        tile_size=32,
+    )
+    assert isinstance(out, np.memmap)
+    assert out.shape == output_shape
+    np.testing.assert_allclose(out, expected, atol=1e-3)
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), out)
+
+
+def test_apply_transform_channel_first():
+    moving = np.stack([_image(seed=0), _image(seed=1)])
+    out = apply_transform(moving, _similarity(), (60, 50), tile_size=16)
+    assert out.shape == (2, 60, 50)
+    for c in range(2):
+        np.testing.assert_allclose(
+            out[c], apply_transform(moving[c], _similarity(), (60, 50)), atol=1e-5
+        )
+
+
+@pytest.mark.parametrize("suffix", ["json", "yaml", "tfm"])
+@pytest.mark.parametrize("make_transform", [_similarity, _mirrored])
+def test_save_load_round_trip(tmp_path, suffix, make_transform):
+    transform = make_transform()
+    file = str(tmp_path / f"transform.{suffix}")
+    save_transform(transform, file)
+    loaded = load_transform(file)
+    assert loaded.GetName() == transform.GetName()
+    points = _points()
+    np.testing.assert_allclose(
+        _transform_points(loaded, points), _transform_points(transform, points), atol=1e-8
+    )
+
+
+def test_load_missing_transform_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_transform(str(tmp_path / "missing.json"))
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import numpy as np
+import SimpleITK as sitk
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+from txgcv.registration.img_regist import ImageRegister
+from txgcv.util.memmap import spill_array, open_image
+
+
+# "auto" initializes from matched image features instead of keypoints
+KeypointPair = Union[Tuple[np.ndarray, np.ndarray], str]
+
+
+def _regist_worker(
+    fixed_src: str,
+    moving_src: str,
+    keypoints: Optional[KeypointPair],
+    param_value: Dict[str, Any],
+    num_threads: int,
+    cache_dir: Optional[str] = None,
+) -> Tuple[sitk.Transform, Dict[str, Any]]:
+    if num_threads is not None:
+        sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(num_threads)
+    register = ImageRegister()
+    register.set_parameter(param_value)
+    if cache_dir is not None:
+        register.set_cache(cache_dir)
+    register.set_fixed_img(open_image(fixed_src))
+    register.set_moving_img(open_image(moving_src))
+    if isinstance(keypoints, str):
+        register.feature_initialize()
+    elif keypoints is not None:
+        register.keypoint_initialize(*keypoints)
+    transform, telemetry = register._optimize_cached()
+    metrics = {
+        "metric": telemetry.final_metric,
+        "num_iter": len(telemetry),
+        "telemetry": telemetry.as_dict(),
+    }
+    return (transform, metrics)
+
+
+def batch_regist(
+    fixed_img: Union[str, np.ndarray],
+    moving_imgs: Sequence[Union[str, np.ndarray]],
+    keypoints: Union[Sequence[Optional[KeypointPair]], str] = None,
+    num_workers: int = None,
+    num_threads: int = None,
+    param_dict: Dict[str, Any] = None,
+    cache_dir: str = None,
+) -> Iterator[Tuple[int, sitk.Transform, Dict[str, Any]]]:
+    """Register many moving images against one fixed image on a process pool
+
+    Images are handed to the workers as memory mapped ``.npy`` files or image
+    paths, so pixel data is not pickled. Each worker limits SimpleITK to
+    ``num_threads`` threads so that ``num_workers * num_threads`` does not
+    oversubscribe the machine.
+
+    Args:
+        fixed_img: fixed image (channel first, as :meth:`ImageRegister.set_fixed_img`)
+            or its path.
+        moving_imgs: moving images or their paths.
+        keypoints (optional): per moving image ``(moving_kp, fixed_kp)`` passed
+            to :meth:`ImageRegister.keypoint_initialize`, "auto" for
+            :meth:`ImageRegister.feature_initialize` or None to start from
+            the geometric center alignment. A single "auto" applies to all.
+        num_workers (int, optional): number of worker processes, defaults to
+            the number of CPUs.
+        num_threads (int, optional): SimpleITK threads per worker, defaults to
+            the number of CPUs divided by ``num_workers``.
+        param_dict (dict, optional): parameter values of :class:`ImageRegister`,
+            the current class parameters are used if not given.
+        cache_dir (str, optional): directory of a :class:`RegistCache` shared
+            by the workers, pairs registered before are not registered again.
+
+    Yields:
+        Index of the moving image, its final transform and metrics, in the
+        order the registrations finish.
+    """
+    if len(moving_imgs) == 0:
+        return
+    num_cpu = os.cpu_count() or 1
+    if num_workers is None:
+        num_workers = min(num_cpu, len(moving_imgs))
+    if num_threads is None:
+        num_threads = max(1, num_cpu // max(num_workers, 1))
+    if keypoints is None or isinstance(keypoints, str):
+        keypoints = [keypoints] * len(moving_imgs)
+    param_value = {key: param.value for key, param in ImageRegister._param_dict.items()}
+    if param_dict is not None:
+        param_value.update(param_dict)
+
+    with tempfile.TemporaryDirectory(prefix="regist_batch_") as input_dir:
+        fixed_src = spill_array(fixed_img, input_dir, "fixed")
+        moving_srcs = [
+            spill_array(img, input_dir, f"moving_{i}") for i, img in enumerate(moving_imgs)
+        ]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {
+                executor.submit(
+                    _regist_worker, fixed_src, src, kp, param_value, num_threads, cache_dir
+                ): i
+                for i, (src, kp) in enumerate(zip(moving_srcs, keypoints))
+            }
+            for future in as_completed(futures):
+                transform, metrics = future.result()
+                yield (futures[future], transform, metrics)
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import SimpleITK as sitk
+from typing import Any, Optional, Tuple
+from txgcv.registration.telemetry import RegistTelemetry
+from txgcv.registration.transform import _transform_to_dict, _transform_from_dict
+
+
+class RegistCache(object):
+    """On-disk cache of registration transforms and telemetry
+
+    Every entry is a single ``.npz`` file named by its key. Entries are written
+    to a temporary file and moved into place atomically, so processes sharing
+    the directory never read partial entries. Reading an entry refreshes its
+    modification time, and after every write the least recently used entries
+    are removed until the directory holds at most ``max_bytes``.
+    """
+
+    _suffix = ".npz"
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Digest of json serializable key parts"""
+        text = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self._suffix)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def get(self, key: str) -> Optional[Tuple[sitk.Transform, RegistTelemetry]]:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                transform = _transform_from_dict(json.loads(str(data["transform"])))
+                telemetry = RegistTelemetry.from_dict(
+                    {name: data[name] for name in RegistTelemetry._fields}
+                )
+            os.utime(path)
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            # missing, evicted by another process meanwhile or unreadable
+            return None
+        return (transform, telemetry)
+
+    def put(self, key: str, transform: sitk.Transform, telemetry: RegistTelemetry) -> None:
+        arrays = telemetry.as_dict()
+        arrays["transform"] = np.array(json.dumps(_transform_to_dict(transform)))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the size budget is met"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self._suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass  # evicted by another process
+            total -= size
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(self._suffix):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,137 @@
+import numpy as np
+from typing import Any, Tuple
+
+
+_NUM_SCALE = 3
+
+
+def match_features(
+    moving: Any,
+    fixed: Any,
+    feature_size: int = 512,
+    num_feature: int = 500,
+    max_ratio: float = 0.8,
+    mirror: str = "auto",
+    fast_threshold: float = 0.08,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Corresponding keypoints of two single channel images from ORB features
+
+    Both images are block averaged to at most ``feature_size`` pixels along
+    their longer edge, ORB features are detected on the small images and
+    matched by mutual nearest neighbours passing the ratio test. ORB is not
+    invariant to mirroring, so unless ``mirror`` is "never" the fixed features
+    are also matched against the moving features described on the vertically
+    flipped moving image.
+    The matches of both orientations are returned together, the robust
+    similarity estimation keeps those of the orientation which fits.
+
+    Args:
+        moving: HxW moving image or array-like.
+        fixed: HxW fixed image or array-like.
+        feature_size (int): maximum edge length features are detected at.
+        num_feature (int): maximum number of features per image.
+        max_ratio (float): maximum ratio of the distances to the closest and
+            the second closest descriptor of a match.
+        mirror (str): "auto", "never" or "always", as ``keypoint_mirror`` of
+            :class:`ImageRegister`.
+        fast_threshold (float): FAST corner threshold on images scaled to [0, 1].
+
+    Returns:
+        Nx2 (x, y) moving and fixed keypoints in full resolution pixels.
+    """
+    moving_small, moving_factor = _feature_image(moving, feature_size)
+    fixed_small, fixed_factor = _feature_image(fixed, feature_size)
+    fixed_kp, fixed_desc = _orb(fixed_small, num_feature, fast_threshold)
+    moving_kp, moving_desc = _orb(moving_small, num_feature, fast_threshold)
+
+    moving_kps, fixed_kps = [], []
+    for flip in {"auto": [False, True], "never": [False], "always": [True]}[mirror]:
+        kp, desc = moving_kp, moving_desc
+        if flip:
+            kp, desc = _flip_orb(moving_small, moving_kp, fast_threshold)
+        if len(kp) == 0 or len(fixed_kp) == 0:
+            continue
+        from skimage.feature import match_descriptors
+
+        matches = match_descriptors(desc, fixed_desc, cross_check=True, max_ratio=max_ratio)
+        moving_kps.append(kp[matches[:, 0], :2])
+        fixed_kps.append(fixed_kp[matches[:, 1], :2])
+    if len(moving_kps) == 0:
+        return (np.zeros((0, 2)), np.zeros((0, 2)))
+    return (
+        _full_resolution(np.concatenate(moving_kps), moving_factor),
+        _full_resolution(np.concatenate(fixed_kps), fixed_factor),
+    )
+
+
+def _feature_factor(shape: Tuple[int, ...], feature_size: int) -> int:
+    # block size bringing the longer edge to at most feature_size
+    return max(1, -(-max(shape[-2:]) // feature_size))
+
+
+def _feature_image(img: Any, feature_size: int) -> Tuple[np.ndarray, int]:
+    factor = _feature_factor(img.shape, feature_size)
+    small = _block_mean(img, factor) if factor > 1 else np.asarray(img, dtype=np.float32)
+    lo, hi = np.percentile(small, [0.5, 99.5])
+    small = np.clip((small - lo) / max(hi - lo, 1e-12), 0, 1)
+    return (small, factor)
+
+
+def _orb(
+    img: np.ndarray, num_feature: int, fast_threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """ORB features as Nx4 (row, col, scale, orientation) and descriptors"""
+    from skimage.feature import ORB
+
+    # a few scales suffice on a thumbnail, the default of 8 more than doubles
+    # the time
+    orb = ORB(n_keypoints=num_feature, n_scales=_NUM_SCALE, fast_threshold=fast_threshold)
+    try:
+        orb.detect_and_extract(img)
+    except RuntimeError:
+        # no corners at all, e.g. a blank image
+        return (np.zeros((0, 4)), np.zeros((0, 256), dtype=bool))
+    features = np.column_stack([orb.keypoints, orb.scales, orb.orientations])
+    return (features, orb.descriptors)
+
+
+def _flip_orb(
+    img: np.ndarray, features: np.ndarray, fast_threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Features of ``img`` described as if it were flipped upside down
+
+    Corner detection commutes with the flip, so only the descriptors are
+    extracted again from the flipped image, at the flipped keypoints with
+    negated orientations, in (row, col) of the unflipped image.
+    """
+    from skimage.feature import ORB
+
+    if len(features) == 0:
+        return (features, np.zeros((0, 256), dtype=bool))
+    orb = ORB(n_scales=_NUM_SCALE, fast_threshold=fast_threshold)
+    # extract returns the descriptors grouped by octave
+    octave = np.round(np.log(features[:, 2]) / np.log(orb.downscale)).astype(int)
+    features = features[np.argsort(octave, kind="stable")]
+    flipped = features[:, :2].copy()
+    flipped[:, 0] = img.shape[0] - 1 - flipped[:, 0]
+    orb.extract(img[::-1], flipped, features[:, 2], -features[:, 3])
+    return (features[orb.mask_], orb.descriptors)
+
+
+def _full_resolution(points: np.ndarray, factor: int) -> np.ndarray:
+    # (row, col) of block averaged pixels to full resolution (x, y)
+    return (points[:, ::-1].astype(np.float64) + 0.5) * factor - 0.5
+
+
+def _block_mean(img: Any, factor: int, band: int = 64) -> np.ndarray:
+    """factor x factor block average read band by band of rows"""
+    h, w = img.shape[-2:]
+    oh, ow = h // factor, w // factor
+    out = np.empty(img.shape[:-2] + (oh, ow), dtype=np.float32)
+    rows = band * factor
+    for y0 in range(0, oh * factor, rows):
+        y1 = min(y0 + rows, oh * factor)
+        block = np.asarray(img[..., y0:y1, : ow * factor], dtype=np.float32)
+        block = block.reshape(block.shape[:-2] + ((y1 - y0) // factor, factor, ow, factor))
+        out[..., y0 // factor:y1 // factor, :] = block.mean(axis=(-3, -1))
+    return out
@@ -2,8 +2,46 @@ import numpy as np
 import time
 import random
 import SimpleITK as sitk
-from typing import List, Tuple, Callable, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Sequence, Tuple, Callable, Dict, Union
 from txgcv.base import Algorithm, Parameter
+from txgcv.segmentation import TissueMask
+from txgcv.util import array_digest, param_digest
+from txgcv.registration.telemetry import RegistTelemetry, TelemetryStream
+from txgcv.registration.result import RegistResult
+from txgcv.registration.cache import RegistCache
+from txgcv.registration.transform import _transform_to_dict
+from txgcv.registration.keypoint import estimate_similarity, similarity_to_sitk
+from txgcv.registration.feature import match_features, _feature_factor
+
+
+# parameters read by the optimizer, which key a cached registration. The
+# keypoint, ransac and feature parameters only act through the initial
+# transform, which is keyed itself, and the resample tile size and thread
+# count do not change the transform
+_OPTIMIZER_PARAMS = [
+    "sampling_rate",
+    "num_hist_bin",
+    "learning_rate",
+    "min_step",
+    "num_iter",
+    "grad_tol",
+    "relax_factor",
+    "shrink_factor",
+    "smooth_sigma",
+    "num_start",
+    "num_keep",
+    "start_angle",
+    "start_scale",
+    "start_translation",
+    "random_seed",
+    "sampling_strategy",
+    "level_sampling_rate",
+    "level_sampling_strategy",
+    "level_num_iter",
+    "plateau_window",
+    "plateau_tol",
+]
 
 
 class ImageRegister(Algorithm):
@@ -63,149 +101,754 @@ class ImageRegister(Algorithm):
             val_range=[0, np.inf],
             info="sigma of smoothing Gaussian kernal used at each resolution",
         ),
+        "fixed_channel": Parameter(
+            value=1,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="channel of a multi channel fixed image used for registration",
+        ),
+        "moving_channel": Parameter(
+            value=1,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="channel of a multi channel moving image used for registration",
+        ),
+        "resample_tile_size": Parameter(
+            value=4096,
+            val_type=int,
+            val_range=[64, np.inf],
+            info="tile edge length when resampling all channels of the moving image",
+        ),
+        "num_start": Parameter(
+            value=1,
+            val_type=int,
+            val_range=[1, np.inf],
+            info="number of perturbed initial transforms registered concurrently",
+        ),
+        "num_keep": Parameter(
+            value=1,
+            val_type=int,
+            val_range=[1, np.inf],
+            info="number of best starts continued after the coarsest level",
+        ),
+        "start_angle": Parameter(
+            value=0.1,
+            val_type=float,
+            val_range=[0, np.pi],
+            info="maximum angle perturbation in radian of multi start",
+        ),
+        "start_scale": Parameter(
+            value=0.05,
+            val_type=float,
+            val_range=[0, 1],
+            info="maximum relative scale perturbation of multi start",
+        ),
+        "start_translation": Parameter(
+            value=20.0,
+            val_type=float,
+            val_range=[0, np.inf],
+            info="maximum translation perturbation in pixel of multi start",
+        ),
+        "random_seed": Parameter(
+            value=0,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="seed of the multi start perturbations and metric sampling",
+        ),
+        "sampling_strategy": Parameter(
+            value="random",
+            val_type=str,
+            options=["random", "regular", "none"],
+            info="metric sampling, regular samples a seeded jittered grid, none all pixels",
+        ),
+        "level_sampling_rate": Parameter(
+            value=[],
+            val_type="LIST_OF_FLOAT",
+            val_range=[0, 1],
+            info="sampling rate of each resolution level, empty uses sampling_rate",
+        ),
+        "level_sampling_strategy": Parameter(
+            value=[],
+            val_type="LIST_OF_STR",
+            options=["random", "regular", "none"],
+            info="sampling strategy of each resolution level, empty uses sampling_strategy",
+        ),
+        "level_num_iter": Parameter(
+            value=[],
+            val_type="LIST_OF_INT",
+            val_range=[1, np.inf],
+            info="maximum iteration of each resolution level, empty uses num_iter",
+        ),
+        "plateau_window": Parameter(
+            value=0,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="stop a level when the metric improved less than plateau_tol over "
+            "this many iterations, 0 disables",
+        ),
+        "plateau_tol": Parameter(
+            value=1e-3,
+            val_type=float,
+            val_range=[0, np.inf],
+            info="relative metric improvement over plateau_window regarded as plateau",
+        ),
+        "num_threads": Parameter(
+            value=0,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="threads shared by all starts, 0 uses the SimpleITK default",
+        ),
+        "keypoint_estimator": Parameter(
+            value="ransac",
+            val_type=str,
+            options=["ransac", "lstsq"],
+            info="keypoint initialization robust to outliers or plain least squares",
+        ),
+        "keypoint_mirror": Parameter(
+            value="auto",
+            val_type=str,
+            options=["auto", "never", "always"],
+            info="allow a mirrored keypoint initialization, auto if it fits better",
+        ),
+        "ransac_threshold": Parameter(
+            value=10.0,
+            val_type=float,
+            val_range=[0, np.inf],
+            info="inlier keypoint residual in moving image pixels, downsampled pixels for feature init",
+        ),
+        "ransac_iter": Parameter(
+            value=1000,
+            val_type=int,
+            val_range=[1, np.inf],
+            info="number of random keypoint pair hypotheses of ransac",
+        ),
+        "feature_size": Parameter(
+            value=512,
+            val_type=int,
+            val_range=[64, np.inf],
+            info="maximum edge length automatic initialization detects features at",
+        ),
+        "num_feature": Parameter(
+            value=500,
+            val_type=int,
+            val_range=[2, np.inf],
+            info="maximum number of features per image of automatic initialization",
+        ),
+        "feature_ratio": Parameter(
+            value=0.8,
+            val_type=float,
+            val_range=[0, 1],
+            info="maximum descriptor distance ratio of a feature match",
+        ),
     }
 
     def __init__(
         self, moving_img: np.ndarray = None, fixed_img: np.ndarray = None
     ) -> None:
         super().__init__()
+        self._init_transform = None
+        self._final_transform = None
+        self._channel_img = {}
+        self._digest = {}
+        self._cache = None
         self.set_moving_img(moving_img)
         self.set_fixed_img(fixed_img)
 
     def set_moving_img(self, img: np.ndarray) -> None:
-        if img is None:
-            self._moving_img = None
-        else:
-            self._moving_img = sitk.GetImageFromArray(img)
+        """Set the HxW or channel first CxHxW moving image"""
+        self._moving_mask = None
+        self._moving_pyramid = {}
+        self._channel_img.pop("moving", None)
+        self._digest.pop("moving", None)
+        self._digest.pop("moving_mask", None)
+        # registration runs on float32, convert once here instead of casting
+        # on every call (no copy if img is float32 already)
+        self._moving_array = _as_float32(img)
 
     def set_fixed_img(self, img: np.ndarray) -> None:
-        if img is None:
-            self._fixed_img = None
-        else:
-            self._fixed_img = sitk.GetImageFromArray(img[1, :, :])
+        """Set the HxW or channel first CxHxW fixed image"""
+        self._fixed_mask = None
+        self._fixed_pyramid = {}
+        self._channel_img.pop("fixed", None)
+        self._digest.pop("fixed", None)
+        self._digest.pop("fixed_mask", None)
+        self._fixed_array = _as_float32(img)
 
-    def keypoint_initialize(
-        self, moving_kp: List[Tuple[float, float]], fixed_kp: List[Tuple[float, float]]
+    @property
+    def _moving_img(self) -> sitk.Image:
+        return self._registration_channel("moving", self._moving_array, self._moving_pyramid)
+
+    @property
+    def _fixed_img(self) -> sitk.Image:
+        return self._registration_channel("fixed", self._fixed_array, self._fixed_pyramid)
+
+    def _registration_channel(
+        self, role: str, array: np.ndarray, pyramid: dict
+    ) -> sitk.Image:
+        # the single channel image registration runs on, rebuilt (and its
+        # pyramid dropped) only when the selected channel changes
+        if array is None:
+            return None
+        channel = self._param_dict[f"{role}_channel"].value if array.ndim == 3 else None
+        if role not in self._channel_img or self._channel_img[role][0] != channel:
+            img = array if channel is None else array[channel]
+            # SimpleITK cannot import a numpy buffer without copying it (it has
+            # no GetImageViewFromArray, that is ITK's), so the channel is
+            # copied once per image and channel instead of on every call
+            self._channel_img[role] = (channel, sitk.GetImageFromArray(img))
+            pyramid.clear()
+        return self._channel_img[role][1]
+
+    def resample_moving(
+        self, transform: sitk.Transform = None, out: np.ndarray = None
     ) -> np.ndarray:
+        """Resample every channel of the moving image onto the fixed image grid
+
+        All channels are resampled in a single pass per tile with the transform
+        found on the registration channel.
+
+        Args:
+            transform (sitk.Transform, optional): defaults to the final transform
+                of the last :meth:`regist`, or the keypoint initialization.
+            out (np.ndarray, optional): HxW or CxHxW output, e.g. memory mapped.
+
+        Returns:
+            Resampled moving image with the channel layout of the input.
+        """
+        if transform is None:
+            transform = self._final_transform
+        if transform is None:
+            transform = self._init_transform
+        if transform is None:
+            raise ValueError("no transform available, run keypoint_initialize or regist first")
+        return self._result(transform).resample(out=out)
+
+    def _result(self, transform: sitk.Transform, **kwargs) -> RegistResult:
+        return RegistResult(
+            transform,
+            self._moving_array,
+            self._fixed_array,
+            moving_channel=self._param_dict["moving_channel"].value,
+            fixed_channel=self._param_dict["fixed_channel"].value,
+            tile_size=self._param_dict["resample_tile_size"].value,
+            **kwargs,
+        )
+
+    def set_init_transform(self, transform: sitk.Transform) -> None:
+        """Start :meth:`regist` from a given transform, e.g. a loaded one"""
+        self._init_transform = transform
+        self._final_transform = None
+
+    def set_moving_mask(self, mask: Union[TissueMask, np.ndarray]) -> None:
+        """Restrict metric sampling of the moving image to tissue"""
+        self._moving_mask = None if mask is None else _mask_to_sitk(mask)
+        self._digest["moving_mask"] = _mask_digest(self._moving_mask)
+
+    def set_fixed_mask(self, mask: Union[TissueMask, np.ndarray]) -> None:
+        """Restrict metric sampling of the fixed image to tissue"""
+        self._fixed_mask = None if mask is None else _mask_to_sitk(mask)
+        self._digest["fixed_mask"] = _mask_digest(self._fixed_mask)
+
+    def set_cache(self, cache: Union[RegistCache, str]) -> None:
+        """Memoize :meth:`regist` and :meth:`keypoint_initialize` on disk
 
-        fix_data = fixed_kp.flatten()
-        n = len(fix_data)
-        mv_data = np.zeros((n, 6))
-        mv_data[0::2, 2] = 1
-        mv_data[1::2, 5] = 1
-        mv_data[0::2, 0] = moving_kp[:, 0]
-        mv_data[0::2, 1] = moving_kp[:, 1]
-        mv_data[1::2, 3] = moving_kp[:, 0]
-        mv_data[1::2, 4] = moving_kp[:, 1]
-        transform = np.linalg.lstsq(mv_data, fix_data)[0]
-        scale = np.sqrt(
-            np.abs(transform[0] * transform[4] - transform[1] * transform[3])
+        Args:
+            cache: cache or its directory, None disables caching.
+        """
+        if isinstance(cache, str):
+            cache = RegistCache(cache)
+        self._cache = cache
+
+    def _image_digest(self, role: str) -> str:
+        # digest of the registration channel, computed once per image and channel
+        array = getattr(self, f"_{role}_array")
+        if array is None:
+            return None
+        channel = self._param_dict[f"{role}_channel"].value if array.ndim == 3 else None
+        if role not in self._digest or self._digest[role][0] != channel:
+            img = array if channel is None else array[channel]
+            self._digest[role] = (channel, array_digest(img))
+        return self._digest[role][1]
+
+    def _regist_key(self) -> str:
+        # the channels are part of the image digests
+        param_value = {key: self._param_dict[key].value for key in _OPTIMIZER_PARAMS}
+        init = self._init_transform
+        return RegistCache.make_key(
+            "regist",
+            self._image_digest("fixed"),
+            self._image_digest("moving"),
+            self._digest.get("fixed_mask"),
+            self._digest.get("moving_mask"),
+            param_digest(param_value),
+            None if init is None else _transform_to_dict(init),
         )
-        if transform[0] * transform[4] < 0:
-            mirror = -1
-        else:
-            mirror = 1
-        cos_theta = 0.5 * (transform[0] / mirror + transform[4]) / scale
-        sin_theta = 0.5 * (transform[3] - transform[1]) / scale
-        theta = np.arctan2(sin_theta, cos_theta)
-        trans_x = transform[2]
-        trans_y = transform[5]
-
-        init_transform = sitk.Similarity2DTransform()
-        init_transform.SetScale(scale)
-        init_transform.SetAngle(theta)
-        init_transform.SetTranslation([trans_x, trans_y])
-
-        # if mirror == -1:
-        #     print("flipping")
-        #     self._moving_img = self._moving_img[:, ::-1]
-
-        self.moving_resampled = sitk.Resample(
-            self._moving_img,
-            # self.fix_resampled,
-            self._fixed_img,
-            init_transform,
-            sitk.sitkLinear,
-            0.0,
-            self._moving_img.GetPixelID(),
+
+    def keypoint_initialize(
+        self, moving_kp: np.ndarray, fixed_kp: np.ndarray
+    ) -> RegistResult:
+        """Similarity transform estimated from corresponding keypoints
+
+        The transform maps the fixed keypoints onto the moving keypoints, robust
+        to outliers with ``keypoint_estimator`` ransac. A mirrored fit flips the
+        moving image about its vertical center line before the similarity.
+
+        Args:
+            moving_kp (np.ndarray): Nx2 (x, y) keypoints of the moving image.
+            fixed_kp (np.ndarray): Nx2 (x, y) corresponding fixed image keypoints.
+
+        Returns:
+            Result holding the initial transform and the residual of every
+            keypoint in moving image pixels, images are resampled on demand.
+        """
+        return self._keypoint_initialize(
+            moving_kp, fixed_kp, self._param_dict["ransac_threshold"].value
         )
 
-        checker_img = sitk.CheckerBoard(
-            self._fixed_img, self.moving_resampled, [20, 20]
+    def _keypoint_initialize(
+        self, moving_kp: np.ndarray, fixed_kp: np.ndarray, threshold: float
+    ) -> RegistResult:
+        """:meth:`keypoint_initialize` with the inlier residual ``threshold``
+        in moving image pixels"""
+        moving_kp = np.asarray(moving_kp, dtype=np.float64)
+        fixed_kp = np.asarray(fixed_kp, dtype=np.float64)
+        estimator = {
+            key: self._param_dict[key].value
+            for key in ["keypoint_estimator", "keypoint_mirror", "ransac_iter", "random_seed"]
+        }
+        estimator["ransac_threshold"] = threshold
+        if self._cache is not None:
+            # the images center the stored transform
+            key = RegistCache.make_key(
+                "keypoint",
+                self._image_digest("fixed"),
+                self._image_digest("moving"),
+                array_digest(moving_kp),
+                array_digest(fixed_kp),
+                estimator,
+            )
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._init_transform = cached[0]
+                self._final_transform = None
+                residual = self._keypoint_residual(moving_kp, fixed_kp)
+                inlier = residual < estimator["ransac_threshold"]
+                if estimator["keypoint_estimator"] != "ransac":
+                    inlier[:] = True
+                return self._result(
+                    cached[0], keypoint_residual=residual, keypoint_inlier=inlier
+                )
+
+        (a, b), mirror, residual, inlier = estimate_similarity(
+            fixed_kp,
+            moving_kp,
+            method=estimator["keypoint_estimator"],
+            mirror=estimator["keypoint_mirror"],
+            threshold=estimator["ransac_threshold"],
+            num_iter=estimator["ransac_iter"],
+            seed=estimator["random_seed"],
+        )
+        init_transform = similarity_to_sitk(
+            (a, b), mirror, _center(self._fixed_array), _center(self._moving_array)
         )
-        checker_img = sitk.GetArrayFromImage(checker_img)
         self._init_transform = init_transform
-        return checker_img
+        self._final_transform = None
+        if self._cache is not None:
+            self._cache.put(key, init_transform, RegistTelemetry(capacity=1))
+        return self._result(init_transform, keypoint_residual=residual, keypoint_inlier=inlier)
+
+    def feature_initialize(self) -> RegistResult:
+        """Keypoint initialization from automatically matched ORB features
+
+        Features are detected and matched on downsampled registration channels
+        (see :func:`match_features`) and the matches are passed to
+        :meth:`keypoint_initialize`, so no manually placed keypoints are needed.
+
+        The matches are located on the downsampled images, so
+        ``ransac_threshold`` is taken in pixels of the downsampled moving
+        image, the localization error of a match grows with the downsampling.
+
+        Returns:
+            Result of :meth:`keypoint_initialize` on the matched features.
+        """
+        if self._moving_array is None or self._fixed_array is None:
+            raise ValueError("set moving and fixed images first")
+        feature_size = self._param_dict["feature_size"].value
+        moving_kp, fixed_kp = match_features(
+            sitk.GetArrayViewFromImage(self._moving_img),
+            sitk.GetArrayViewFromImage(self._fixed_img),
+            feature_size=feature_size,
+            num_feature=self._param_dict["num_feature"].value,
+            max_ratio=self._param_dict["feature_ratio"].value,
+            mirror=self._param_dict["keypoint_mirror"].value,
+        )
+        if len(moving_kp) < 2:
+            raise ValueError(f"only {len(moving_kp)} feature matches found, set keypoints")
+        factor = _feature_factor(self._moving_array.shape, feature_size)
+        return self._keypoint_initialize(
+            moving_kp, fixed_kp, self._param_dict["ransac_threshold"].value * factor
+        )
+
+    def _keypoint_residual(self, moving_kp: np.ndarray, fixed_kp: np.ndarray) -> np.ndarray:
+        mapped = np.array([self._init_transform.TransformPoint(tuple(p)) for p in fixed_kp])
+        return np.linalg.norm(mapped - moving_kp, axis=1)
+
+    def regist(self, live_optimize_plot_handle: Callable = None) -> RegistResult:
+        """Run the multi resolution registration
+
+        Args:
+            live_optimize_plot_handle (Callable, optional): receives rate limited,
+                decimated telemetry deltas, see :class:`TelemetryStream`. Pass a
+                :class:`TelemetryStream` to control rate and decimation.
+
+        Returns:
+            Result holding the final transform and the telemetry of the run,
+            images are resampled on demand.
+        """
+        if live_optimize_plot_handle is not None and not isinstance(
+            live_optimize_plot_handle, TelemetryStream
+        ):
+            live_optimize_plot_handle = TelemetryStream(live_optimize_plot_handle)
+        final_transform, telemetry = self._optimize_cached(live_optimize_plot_handle)
+        self._final_transform = final_transform
+        return self._result(final_transform, telemetry=telemetry)
+
+    def _optimize_cached(
+        self, telemetry_stream: TelemetryStream = None
+    ) -> Tuple[sitk.Transform, RegistTelemetry]:
+        if self._cache is None:
+            return self._optimize(telemetry_stream)
+        key = self._regist_key()
+        cached = self._cache.get(key)
+        if cached is not None:
+            if telemetry_stream is not None:
+                telemetry_stream.reset()
+                telemetry_stream.flush(cached[1])
+            return cached
+        transform, telemetry = self._optimize(telemetry_stream)
+        self._cache.put(key, transform, telemetry)
+        return (transform, telemetry)
+
+    def _optimize(
+        self,
+        telemetry_stream: TelemetryStream = None,
+        levels: Sequence[Tuple[int, float]] = None,
+    ) -> Tuple[sitk.Transform, RegistTelemetry]:
+        """Optimize the transform, on the (shrink, sigma) ``levels`` instead of
+        ``shrink_factor`` and ``smooth_sigma`` if given, which also ignores the
+        ``level_`` lists, so that a caller runs its own levels without
+        changing the parameters shared by all registers"""
+        per_level = levels is None
+        if per_level:
+            shrink_factor = self._param_dict["shrink_factor"].value
+            smooth_sigma = self._param_dict["smooth_sigma"].value
+            levels = list(zip(shrink_factor, smooth_sigma))
+        levels = list(levels)
+        self._prune_pyramid(levels)
+        # build the pyramid up front so that concurrent starts share it
+        for shrink, sigma in levels:
+            self._fixed_level(shrink, sigma)
+            self._moving_level(sigma)
+
+        if telemetry_stream is not None:
+            telemetry_stream.reset()
+        flip, transform = _split_flip(self._init_transform)
+        if transform is None:
+            transform = sitk.CenteredTransformInitializer(
+                self._fixed_img,
+                self._moving_img,
+                sitk.Similarity2DTransform(),
+                sitk.CenteredTransformInitializerFilter.GEOMETRY,
+            )
+        for name in ["level_sampling_rate", "level_sampling_strategy", "level_num_iter"]:
+            value = self._param_dict[name].value
+            if per_level and len(value) not in (0, len(levels)):
+                raise ValueError(
+                    f"{name} has {len(value)} entries for {len(levels)} resolution levels"
+                )
+        num_threads = (
+            self._param_dict["num_threads"].value
+            or sitk.ProcessObject.GetGlobalDefaultNumberOfThreads()
+        )
+        capacity = sum(
+            self._level_value("num_iter", level, per_level) for level in range(len(levels))
+        )
+        # telemetry belongs to a single start only, so concurrent registrations
+        # in one process do not share any state
+        starts = [
+            _Start(t, RegistTelemetry(capacity=capacity), flip)
+            for t in self._start_transforms(transform)
+        ]
+
+        # all starts run the coarsest level concurrently, only the best
+        # num_keep continue on the finer, more expensive levels
+        for level, (shrink, sigma) in enumerate(levels):
+            stream = telemetry_stream if len(starts) == 1 else None
+            if stream is not None and level > 0:
+                stream.flush(starts[0].telemetry)
+            threads = max(1, num_threads // len(starts))
+            # the same metric samples for every start keep metrics comparable
+            # and a run reproducible, as random_seed keys cached results (a
+            # seed of 0 is the wall clock to SimpleITK)
+            seed = self._param_dict["random_seed"].value + level + 1
+            if len(starts) == 1:
+                self._run_level(
+                    starts[0], level, shrink, sigma, threads, stream, seed, per_level
+                )
+            else:
+                with ThreadPoolExecutor(max_workers=len(starts)) as executor:
+                    for future in [
+                        executor.submit(
+                            self._run_level,
+                            start,
+                            level,
+                            shrink,
+                            sigma,
+                            threads,
+                            None,
+                            seed,
+                            per_level,
+                        )
+                        for start in starts
+                    ]:
+                        future.result()
+                starts.sort(key=lambda start: start.metric)
+                if level == 0:
+                    starts = starts[: self._param_dict["num_keep"].value]
+        best = min(starts, key=lambda start: start.metric)
+        if telemetry_stream is not None:
+            telemetry_stream.flush(best.telemetry)
+        transform = best.transform
+        if flip is not None:
+            transform = sitk.CompositeTransform([flip, transform])
+        return (transform, best.telemetry)
+
+    def _start_transforms(self, transform: sitk.Transform) -> List[sitk.Transform]:
+        """The initial transform followed by num_start - 1 random perturbations
+        of its angle, scale and translation"""
+        num_start = self._param_dict["num_start"].value
+        if num_start <= 1:
+            return [transform]
+        if not isinstance(transform, sitk.Similarity2DTransform):
+            raise ValueError(
+                f"multi start perturbs a Similarity2DTransform, got {transform.GetName()}"
+            )
+        rng = np.random.default_rng(self._param_dict["random_seed"].value)
+        d_angle = self._param_dict["start_angle"].value
+        d_scale = self._param_dict["start_scale"].value
+        d_trans = self._param_dict["start_translation"].value
+        starts = [transform]
+        for _ in range(num_start - 1):
+            start = sitk.Similarity2DTransform(transform)
+            start.SetAngle(transform.GetAngle() + rng.uniform(-d_angle, d_angle))
+            start.SetScale(transform.GetScale() * (1 + rng.uniform(-d_scale, d_scale)))
+            start.SetTranslation(
+                np.array(transform.GetTranslation()) + rng.uniform(-d_trans, d_trans, 2)
+            )
+            starts.append(start)
+        return starts
+
+    def _run_level(
+        self,
+        start: "_Start",
+        level: int,
+        shrink: int,
+        sigma: float,
+        num_threads: int,
+        telemetry_stream: TelemetryStream = None,
+        seed: int = None,
+        per_level: bool = True,
+    ) -> None:
+        """Optimize one start on one pyramid level in place"""
+        telemetry = start.telemetry
+        plateau_window = self._param_dict["plateau_window"].value
+        plateau_tol = self._param_dict["plateau_tol"].value
+        # SimpleITK does not expose the current step length of the regular
+        # step optimizer, the step size is measured on the optimizer position
+        position = [np.array(start.transform.GetParameters())]
 
-    def regist(self, live_optimize_plot_handle: Callable = None) -> np.ndarray:
+        def record_metric(registration_method):
+            current = np.array(registration_method.GetOptimizerPosition())
+            step_size = np.linalg.norm(current - position[0])
+            position[0] = current
+            telemetry.record(
+                registration_method.GetMetricValue(),
+                registration_method.GetOptimizerIteration(),
+                level,
+                step_size,
+            )
+            if telemetry_stream is not None:
+                telemetry_stream(telemetry)
+            if plateau_window > 0 and _plateau(
+                telemetry.metric[telemetry.level == level], plateau_window, plateau_tol
+            ):
+                registration_method.StopRegistration()
+
+        # the multi resolution levels are run one by one on cached pyramid
+        # images instead of letting SimpleITK rebuild the pyramid every call
+        registration_method = self._registration_method(level, seed, per_level)
+        registration_method.SetNumberOfThreads(num_threads)
+        if start.flip is not None:
+            registration_method.SetMovingInitialTransform(start.flip)
+        registration_method.SetInitialTransform(start.transform, inPlace=False)
+        registration_method.AddCommand(
+            sitk.sitkIterationEvent, lambda: record_metric(registration_method)
+        )
+        start.transform = _unwrap_transform(
+            registration_method.Execute(
+                self._fixed_level(shrink, sigma), self._moving_level(sigma)
+            )
+        )
+        start.metric = registration_method.GetMetricValue()
+
+    def _level_value(self, name: str, level: int, per_level: bool = True) -> Any:
+        """Value of a parameter at one resolution level, taken from its
+        ``level_`` list if given and ``per_level``"""
+        level_value = self._param_dict[f"level_{name}"].value
+        if per_level and len(level_value) > 0:
+            return level_value[level]
+        return self._param_dict[name].value
+
+    def _registration_method(
+        self, level: int, seed: int = None, per_level: bool = True
+    ) -> sitk.ImageRegistrationMethod:
         registration_method = sitk.ImageRegistrationMethod()
         registration_method.SetMetricAsMattesMutualInformation(
             numberOfHistogramBins=self._param_dict["num_hist_bin"].value
         )
-        registration_method.SetMetricSamplingStrategy(registration_method.RANDOM)
-        registration_method.SetMetricSamplingPercentage(
-            self._param_dict["sampling_rate"].value
+        strategy = self._level_value("sampling_strategy", level, per_level)
+        registration_method.SetMetricSamplingStrategy(
+            {
+                "random": registration_method.RANDOM,
+                "regular": registration_method.REGULAR,
+                "none": registration_method.NONE,
+            }[strategy]
         )
+        if strategy != "none":
+            registration_method.SetMetricSamplingPercentage(
+                self._level_value("sampling_rate", level, per_level),
+                sitk.sitkWallClock if seed is None else seed,
+            )
+        if self._fixed_mask is not None:
+            registration_method.SetMetricFixedMask(self._fixed_mask)
+        if self._moving_mask is not None:
+            registration_method.SetMetricMovingMask(self._moving_mask)
         registration_method.SetInterpolator(sitk.sitkLinear)
 
         registration_method.SetOptimizerAsRegularStepGradientDescent(
             learningRate=self._param_dict["learning_rate"].value,
             minStep=self._param_dict["min_step"].value,
-            numberOfIterations=self._param_dict["num_iter"].value,
+            numberOfIterations=self._level_value("num_iter", level, per_level),
             gradientMagnitudeTolerance=self._param_dict["grad_tol"].value,
             relaxationFactor=self._param_dict["relax_factor"].value,
         )
         registration_method.SetOptimizerScalesFromPhysicalShift()
+        return registration_method
 
-        registration_method.SetInitialTransform(self._init_transform, inPlace=False)
-        registration_method.SetShrinkFactorsPerLevel(
-            shrinkFactors=self._param_dict["shrink_factor"].value
-        )
-        registration_method.SetSmoothingSigmasPerLevel(
-            smoothingSigmas=self._param_dict["smooth_sigma"].value
-        )
-        registration_method.SmoothingSigmasAreSpecifiedInPhysicalUnitsOn()
+    def _fixed_level(self, shrink: int, sigma: float) -> sitk.Image:
+        """Smoothed and shrunk fixed image of one pyramid level, cached until the
+        fixed image or its registration channel changes. The full resolution
+        level is the fixed image itself"""
+        fixed_img = self._fixed_img  # drops the pyramid on channel change
+        key = (shrink, sigma)
+        if key not in self._fixed_pyramid:
+            img = _smooth(fixed_img, sigma)
+            if shrink > 1:
+                img = sitk.Shrink(img, [shrink] * img.GetDimension())
+            self._fixed_pyramid[key] = img
+        return self._fixed_pyramid[key]
 
-        def start():
-            global metric_values, multires_iterations
-            metric_values = []
-            multires_iterations = []
+    def _moving_level(self, sigma: float) -> sitk.Image:
+        """Smoothed moving image of one pyramid level, the moving image is not
+        shrunk as the metric is evaluated on the fixed image grid"""
+        moving_img = self._moving_img  # drops the pyramid on channel change
+        if sigma not in self._moving_pyramid:
+            self._moving_pyramid[sigma] = _smooth(moving_img, sigma)
+        return self._moving_pyramid[sigma]
 
-        def end():
-            global metric_values, multires_iterations
-            del metric_values
-            del multires_iterations
+    def _prune_pyramid(self, levels: List[Tuple[int, float]]) -> None:
+        for key in list(self._fixed_pyramid.keys()):
+            if key not in levels:
+                del self._fixed_pyramid[key]
+        sigmas = [sigma for _, sigma in levels]
+        for key in list(self._moving_pyramid.keys()):
+            if key not in sigmas:
+                del self._moving_pyramid[key]
 
-        def res():
-            pass
 
-        def record_metric(registration_method):
-            global metric_values, multires_iterations
-            multires_iterations.append(len(metric_values))
-            metric_values.append(registration_method.GetMetricValue())
-            if live_optimize_plot_handle is not None:
-                live_optimize_plot_handle((multires_iterations, metric_values))
-
-        registration_method.AddCommand(sitk.sitkStartEvent, start)
-        registration_method.AddCommand(sitk.sitkEndEvent, end)
-        registration_method.AddCommand(sitk.sitkMultiResolutionIterationEvent, res)
-        registration_method.AddCommand(
-            sitk.sitkIterationEvent, lambda: record_metric(registration_method)
-        )
+def _mask_to_sitk(mask: Union[TissueMask, np.ndarray]) -> sitk.Image:
+    if isinstance(mask, TissueMask):
+        # keep the mask at its low resolution, the spacing maps it onto the
+        # physical space of the full resolution image
+        f = mask.factor
+        mask_img = sitk.GetImageFromArray(mask.mask.astype(np.uint8))
+        mask_img.SetSpacing([float(f), float(f)])
+        mask_img.SetOrigin([(f - 1) / 2, (f - 1) / 2])
+        return mask_img
+    return sitk.GetImageFromArray(np.asarray(mask).astype(np.uint8))
 
-        final_transform = registration_method.Execute(
-            sitk.Cast(self._fixed_img, sitk.sitkFloat32),
-            sitk.Cast(self._moving_img, sitk.sitkFloat32),
-        )
-        moving_resampled = sitk.Resample(
-            self._moving_img,
-            self._fixed_img,
-            final_transform,
-            sitk.sitkLinear,
-            0.0,
-            self._moving_img.GetPixelID(),
-        )
 
-        checker_img = sitk.CheckerBoard(self._fixed_img, moving_resampled, [20, 20])
-        checker_img = sitk.GetArrayFromImage(checker_img)
-        return checker_img
+def _plateau(metric: np.ndarray, window: int, tol: float) -> bool:
+    # relative improvement of the metric (minimized) over the last window
+    # iterations of a level
+    if len(metric) <= window:
+        return False
+    improvement = metric[-window - 1] - metric[-1]
+    return improvement < tol * max(abs(metric[-window - 1]), 1e-12)
+
+
+def _center(img: np.ndarray) -> Tuple[float, float]:
+    if img is None:
+        return (0.0, 0.0)
+    h, w = img.shape[-2:]
+    return ((w - 1) / 2, (h - 1) / 2)
+
+
+def _split_flip(transform: sitk.Transform) -> Tuple[sitk.Transform, sitk.Transform]:
+    # a mirrored keypoint initialization is the composite of the moving image
+    # flip and the similarity, only the similarity is optimized
+    if isinstance(transform, sitk.CompositeTransform) and transform.GetNumberOfTransforms() == 2:
+        return (transform.GetNthTransform(0).Downcast(), transform.GetNthTransform(1).Downcast())
+    return (None, transform)
+
+
+def _mask_digest(mask: sitk.Image) -> str:
+    if mask is None:
+        return None
+    geometry = str((mask.GetSpacing(), mask.GetOrigin()))
+    return geometry + array_digest(sitk.GetArrayViewFromImage(mask))
+
+
+def _as_float32(img: np.ndarray) -> np.ndarray:
+    if img is None:
+        return None
+    return np.ascontiguousarray(img, dtype=np.float32)
+
+
+def _smooth(img: sitk.Image, sigma: float) -> sitk.Image:
+    if sigma <= 0:
+        return img
+    # same smoothing as the pyramid of sitk.ImageRegistrationMethod with sigmas
+    # specified in physical units
+    return sitk.DiscreteGaussian(img, variance=float(sigma) ** 2, useImageSpacing=True)
+
+
+def _unwrap_transform(transform: sitk.Transform) -> sitk.Transform:
+    # Execute wraps the optimized transform into a composite transform, unwrap
+    # it so that levels do not nest composites
+    if isinstance(transform, sitk.CompositeTransform) and transform.GetNumberOfTransforms() == 1:
+        return transform.GetNthTransform(0).Downcast()
+    return transform
+
+
+class _Start(object):
+    """Transform, telemetry and last metric of one multi start candidate,
+    ``flip`` is the fixed mirror applied to the moving image"""
+
+    def __init__(
+        self, transform: sitk.Transform, telemetry: RegistTelemetry, flip: sitk.Transform = None
+    ) -> None:
+        self.transform = transform
+        self.telemetry = telemetry
+        self.flip = flip
+        self.metric = np.inf
@@ -0,0 +1,170 @@
+import numpy as np
+import SimpleITK as sitk
+from typing import Tuple
+
+
+# (a, b) of the similarity z -> a * z + b on points as complex numbers, the
+# mirrored similarity is z -> a * conj(z) + b
+Similarity = Tuple[complex, complex]
+
+
+def fit_similarity(
+    src: np.ndarray, dst: np.ndarray, weight: np.ndarray = None
+) -> Similarity:
+    """Weighted least squares similarity mapping complex points src onto dst"""
+    if weight is None:
+        weight = np.ones(len(src))
+    total = max(float(np.sum(weight)), 1e-12)
+    src_mean = np.sum(weight * src) / total
+    dst_mean = np.sum(weight * dst) / total
+    src_c = src - src_mean
+    dst_c = dst - dst_mean
+    var = float(np.sum(weight * np.abs(src_c) ** 2))
+    a = np.sum(weight * np.conj(src_c) * dst_c) / var if var > 1e-12 else 1.0 + 0j
+    return (complex(a), complex(dst_mean - a * src_mean))
+
+
+def ransac_similarity(
+    src: np.ndarray,
+    dst: np.ndarray,
+    threshold: float,
+    num_iter: int = 1000,
+    rng: np.random.Generator = None,
+    max_elements: int = 2**22,
+) -> Tuple[Similarity, np.ndarray]:
+    """Similarity mapping complex points src onto dst robust to outliers
+
+    All hypotheses from two point samples are scored at once with the
+    truncated squared residual (MSAC), in chunks of at most ``max_elements``
+    residuals. The best hypothesis is refined by least squares on its inliers.
+
+    Returns:
+        The similarity and the inlier mask.
+    """
+    n = len(src)
+    if n < 3:
+        return (fit_similarity(src, dst), np.ones(n, dtype=bool))
+    if rng is None:
+        rng = np.random.default_rng(0)
+    i = rng.integers(0, n, num_iter)
+    j = rng.integers(0, n - 1, num_iter)
+    j = j + (j >= i)  # two distinct points per hypothesis
+    d_src = src[i] - src[j]
+    valid = np.abs(d_src) > 1e-12
+    i, j, d_src = i[valid], j[valid], d_src[valid]
+    a = (dst[i] - dst[j]) / d_src
+    b = dst[i] - a * src[i]
+
+    best_score, best = np.inf, None
+    threshold2 = threshold ** 2
+    chunk = max(1, max_elements // n)
+    for start in range(0, len(a), chunk):
+        residual2 = np.abs(
+            a[start:start + chunk, None] * src[None] + b[start:start + chunk, None] - dst[None]
+        ) ** 2
+        score = np.minimum(residual2, threshold2).sum(axis=1)
+        k = int(np.argmin(score))
+        if score[k] < best_score:
+            best_score, best = score[k], (a[start + k], b[start + k])
+    if best is None:
+        return (fit_similarity(src, dst), np.ones(n, dtype=bool))
+
+    inlier = np.abs(best[0] * src + best[1] - dst) < threshold
+    for _ in range(2):
+        if np.count_nonzero(inlier) < 2:
+            break
+        best = fit_similarity(src[inlier], dst[inlier])
+        inlier = np.abs(best[0] * src + best[1] - dst) < threshold
+    return (best, inlier)
+
+
+def estimate_similarity(
+    src: np.ndarray,
+    dst: np.ndarray,
+    method: str = "ransac",
+    mirror: str = "auto",
+    threshold: float = 10.0,
+    num_iter: int = 1000,
+    seed: int = 0,
+) -> Tuple[Similarity, bool, np.ndarray, np.ndarray]:
+    """Similarity, optionally mirrored, mapping Nx2 (x, y) points src onto dst
+
+    Args:
+        src (np.ndarray): Nx2 source points.
+        dst (np.ndarray): Nx2 destination points.
+        method (str): "ransac" or "lstsq".
+        mirror (str): "auto" keeps the mirrored model only if it fits better,
+            "never" or "always".
+        threshold (float): inlier residual of ransac.
+        num_iter (int): number of ransac hypotheses.
+        seed (int): seed of the ransac sampling.
+
+    Returns:
+        The similarity, whether it is mirrored, the residual of every point and
+        the inlier mask.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    if src.shape != dst.shape or src.ndim != 2 or src.shape[1] != 2:
+        raise ValueError(f"expect two Nx2 point sets, got {src.shape} and {dst.shape}")
+    if len(src) < 2:
+        raise ValueError("at least 2 point pairs are needed")
+    src_z = src[:, 0] + 1j * src[:, 1]
+    dst_z = dst[:, 0] + 1j * dst[:, 1]
+
+    candidates = []
+    for flip in {"auto": [False, True], "never": [False], "always": [True]}[mirror]:
+        z = np.conj(src_z) if flip else src_z
+        if method == "ransac":
+            rng = np.random.default_rng(seed)
+            similarity, inlier = ransac_similarity(z, dst_z, threshold, num_iter, rng)
+        else:
+            similarity, inlier = fit_similarity(z, dst_z), np.ones(len(z), dtype=bool)
+        residual = np.abs(similarity[0] * z + similarity[1] - dst_z)
+        if method == "ransac":
+            score = np.minimum(residual, threshold) ** 2
+        else:
+            score = residual ** 2
+        candidates.append((float(score.sum()), flip, similarity, residual, inlier))
+    best = candidates[0]
+    for candidate in candidates[1:]:
+        # the unmirrored model wins ties, e.g. two points fit both exactly
+        if candidate[0] < best[0] - 1e-6 * (1 + best[0]):
+            best = candidate
+    _, flip, similarity, residual, inlier = best
+    return (similarity, flip, residual, inlier)
+
+
+def similarity_to_sitk(
+    similarity: Similarity,
+    mirror: bool,
+    fixed_center: Tuple[float, float] = (0.0, 0.0),
+    moving_center: Tuple[float, float] = (0.0, 0.0),
+) -> sitk.Transform:
+    """SimpleITK transform of a similarity, optionally mirrored
+
+    The similarity is centered on ``fixed_center`` so that the optimizer does
+    not couple rotation and translation. A mirrored similarity becomes the
+    composite of a flip of y about ``moving_center`` and a similarity.
+    """
+    a, b = similarity
+    center = complex(*fixed_center)
+    flip = None
+    if mirror:
+        # a * conj(z) + b = flip(conj(a) * z + conj(b - c) + c) with flip
+        # mirroring y about the moving center c
+        c = complex(*moving_center)
+        flip = sitk.AffineTransform(2)
+        flip.SetMatrix([1.0, 0.0, 0.0, -1.0])
+        flip.SetCenter([c.real, c.imag])
+        a, b = np.conj(a), np.conj(b - c) + c
+    translation = b + a * center - center
+
+    transform = sitk.Similarity2DTransform()
+    transform.SetCenter([center.real, center.imag])
+    transform.SetScale(abs(a))
+    transform.SetAngle(float(np.angle(a)))
+    transform.SetTranslation([translation.real, translation.imag])
+    if flip is not None:
+        return sitk.CompositeTransform([flip, transform])
+    return transform
@@ -0,0 +1,312 @@
+import numpy as np
+import SimpleITK as sitk
+from typing import Any, Dict, List, Sequence, Tuple, Union
+from txgcv.base import Algorithm, Parameter
+from txgcv.util import load_image
+from txgcv.registration.img_regist import ImageRegister, _split_flip
+from txgcv.registration.feature import _block_mean
+from txgcv.registration.keypoint import estimate_similarity, similarity_to_sitk
+from txgcv.registration.result import RegistResult, Region
+from txgcv.registration.transform import rescale_transform, remap_transform
+
+
+Levels = Union[str, np.ndarray, Sequence[Any]]
+
+
+class PyramidRegister(Algorithm):
+    """Coarse to fine registration of images too large to register directly
+
+    Both images are given as resolution levels, full resolution first:
+    arrays or memory mapped arrays, array-likes such as
+    :class:`txgcv.util.tiff.TiffLevel`, or the path of a pyramidal TIFF. The
+    registration runs on the finest level no larger than ``max_coarse_size``,
+    downsampled band by band from the coarsest level if no level is small
+    enough. The transform is then carried to ``roi_level`` and refined on
+    ``num_roi`` regions of interest, which are only read as regions. The
+    refined regions vote for the final similarity with ransac, so a region
+    which did not converge is ignored. Full resolution pixels are never all
+    in memory, the returned result resamples lazily.
+
+    Registration parameters are those of ``register``, an
+    :class:`ImageRegister`.
+    """
+
+    _param_dict: Dict[str, Parameter] = {
+        "max_coarse_size": Parameter(
+            value=2048,
+            val_type=int,
+            val_range=[64, np.inf],
+            info="maximum edge length of the level the coarse registration runs on",
+        ),
+        "num_roi": Parameter(
+            value=4,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="number of regions refined after the coarse registration, 0 disables",
+        ),
+        "roi_level": Parameter(
+            value=0,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="resolution level the regions of interest are refined on",
+        ),
+        "roi_size": Parameter(
+            value=1024,
+            val_type=int,
+            val_range=[32, np.inf],
+            info="edge length of regions of interest in pixels of roi_level",
+        ),
+        "roi_margin": Parameter(
+            value=64,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="margin in pixels of roi_level read around the moving region",
+        ),
+        "roi_shrink_factor": Parameter(
+            value=[2, 1],
+            val_type="LIST_OF_INT",
+            val_range=[1, np.inf],
+            info="shrink factor of the region refinement levels",
+        ),
+        "roi_smooth_sigma": Parameter(
+            value=[1, 0],
+            val_type="LIST_OF_INT",
+            val_range=[0, np.inf],
+            info="smoothing sigma of the region refinement levels",
+        ),
+        "roi_threshold": Parameter(
+            value=4.0,
+            val_type=float,
+            val_range=[0, np.inf],
+            info="disagreement in pixels of roi_level above which a region is ignored",
+        ),
+    }
+
+    def __init__(self, register: ImageRegister = None) -> None:
+        super().__init__()
+        self.register = ImageRegister() if register is None else register
+        self._fixed_levels = None
+        self._moving_levels = None
+        self.rois = []
+        self.roi_inlier = np.zeros(0, dtype=bool)
+
+    def set_fixed_levels(self, levels: Levels) -> None:
+        """Set the fixed image levels, full resolution first"""
+        self._fixed_levels = _as_levels(levels)
+
+    def set_moving_levels(self, levels: Levels) -> None:
+        """Set the moving image levels, full resolution first"""
+        self._moving_levels = _as_levels(levels)
+
+    def regist(
+        self,
+        moving_kp: np.ndarray = None,
+        fixed_kp: np.ndarray = None,
+        rois: Sequence[Region] = None,
+        feature_init: bool = False,
+    ) -> RegistResult:
+        """Register coarse to fine
+
+        Args:
+            moving_kp (np.ndarray, optional): Nx2 (x, y) moving keypoints in
+                full resolution pixels for the keypoint initialization.
+            fixed_kp (np.ndarray, optional): corresponding fixed keypoints.
+            rois (optional): regions of interest as (row slice, column slice)
+                in full resolution fixed pixels, selected on the coarse fixed
+                image by texture if not given.
+            feature_init (bool): without keypoints, initialize from features
+                matched on the coarse level (see
+                :meth:`ImageRegister.feature_initialize`).
+
+        Returns:
+            Result with the full resolution transform and the telemetry of the
+            coarse registration.
+        """
+        if self._fixed_levels is None or self._moving_levels is None:
+            raise ValueError("set fixed and moving levels first")
+        register = self.register
+        fixed, fixed_factor = _coarse_level(
+            self._fixed_levels, self._param_dict["max_coarse_size"].value
+        )
+        moving, moving_factor = _coarse_level(
+            self._moving_levels, self._param_dict["max_coarse_size"].value
+        )
+        register.set_fixed_img(fixed)
+        register.set_moving_img(moving)
+        if moving_kp is not None and fixed_kp is not None:
+            register.keypoint_initialize(
+                _downsample_points(moving_kp, moving_factor),
+                _downsample_points(fixed_kp, fixed_factor),
+            )
+        elif feature_init:
+            register.feature_initialize()
+        else:
+            register.set_init_transform(None)
+        coarse = register.regist()
+        transform = rescale_transform(coarse.transform, fixed_factor, moving_factor)
+
+        if self._param_dict["num_roi"].value > 0 or rois is not None:
+            if rois is None:
+                rois = self._select_rois(register._fixed_img, fixed_factor)
+            transform = self._refine(transform, rois)
+        return RegistResult(
+            transform,
+            self._moving_levels[0],
+            self._fixed_levels[0],
+            moving_channel=register.parameter["moving_channel"].value,
+            fixed_channel=register.parameter["fixed_channel"].value,
+            telemetry=coarse.telemetry,
+            tile_size=register.parameter["resample_tile_size"].value,
+        )
+
+    def _select_rois(self, coarse_fixed: sitk.Image, factor: float) -> List[Region]:
+        """Non overlapping windows of the coarse fixed image with most texture,
+        in full resolution pixels"""
+        img = sitk.GetArrayViewFromImage(coarse_fixed).astype(np.float64)
+        level = min(self._param_dict["roi_level"].value, len(self._fixed_levels) - 1)
+        roi_factor = _level_factor(self._fixed_levels, level)
+        size = self._param_dict["roi_size"].value * roi_factor
+        win = int(max(2, min(round(size / factor), *img.shape)))
+        std = _window_std(img, win)
+        rois = []
+        for _ in range(self._param_dict["num_roi"].value):
+            if not np.isfinite(std).any() or np.nanmax(std) <= 0:
+                break
+            y, x = np.unravel_index(np.nanargmax(std), std.shape)
+            rois.append(
+                (
+                    slice(int(y * factor), int((y + win) * factor)),
+                    slice(int(x * factor), int((x + win) * factor)),
+                )
+            )
+            std[max(y - win + 1, 0):y + win, max(x - win + 1, 0):x + win] = np.nan
+        return rois
+
+    def _refine(self, transform: sitk.Transform, rois: Sequence[Region]) -> sitk.Transform:
+        """Refine a full resolution transform on regions of ``roi_level``
+
+        The regions are registered by a register of their own, ``register``
+        keeps the coarse images and initialization of :meth:`regist`.
+        """
+        # a new register shares the parameters, e.g. the channels, but no images
+        register = type(self.register)()
+        level = self._param_dict["roi_level"].value
+        fixed_level = min(level, len(self._fixed_levels) - 1)
+        moving_level = min(level, len(self._moving_levels) - 1)
+        fixed = self._fixed_levels[fixed_level]
+        moving = self._moving_levels[moving_level]
+        fixed_factor = _level_factor(self._fixed_levels, fixed_level)
+        moving_factor = _level_factor(self._moving_levels, moving_level)
+        full_h, full_w = self._fixed_levels[0].shape[-2:]
+        level_transform = rescale_transform(transform, 1 / fixed_factor, 1 / moving_factor)
+        flip, _ = _split_flip(level_transform)
+        margin = self._param_dict["roi_margin"].value
+        mh, mw = moving.shape[-2:]
+
+        # the region levels are passed to the optimizer, the parameters are
+        # shared by all registers and never changed here
+        levels = list(
+            zip(
+                self._param_dict["roi_shrink_factor"].value,
+                self._param_dict["roi_smooth_sigma"].value,
+            )
+        )
+        fixed_pts, moving_pts, roi_index = [], [], []
+        for i, (ys, xs) in enumerate(rois):
+            fy0, fy1, _ = ys.indices(full_h)
+            fx0, fx1, _ = xs.indices(full_w)
+            fy0, fy1 = int(fy0 // fixed_factor), int(-(-fy1 // fixed_factor))
+            fx0, fx1 = int(fx0 // fixed_factor), int(-(-fx1 // fixed_factor))
+            fy1, fx1 = min(fy1, fixed.shape[-2]), min(fx1, fixed.shape[-1])
+            corners = [(fx0, fy0), (fx1, fy0), (fx0, fy1), (fx1, fy1)]
+            mapped = np.array([level_transform.TransformPoint(c) for c in corners])
+            mx0 = max(int(np.floor(mapped[:, 0].min())) - margin, 0)
+            mx1 = min(int(np.ceil(mapped[:, 0].max())) + margin, mw)
+            my0 = max(int(np.floor(mapped[:, 1].min())) - margin, 0)
+            my1 = min(int(np.ceil(mapped[:, 1].max())) + margin, mh)
+            if fy1 - fy0 < 16 or fx1 - fx0 < 16 or my1 - my0 < 16 or mx1 - mx0 < 16:
+                continue
+
+            register.set_fixed_img(np.asarray(fixed[..., fy0:fy1, fx0:fx1]))
+            register.set_moving_img(np.asarray(moving[..., my0:my1, mx0:mx1]))
+            register.set_init_transform(
+                remap_transform(level_transform, (1, (-fx0, -fy0)), (1, (-mx0, -my0)))
+            )
+            local, _ = register._optimize(levels=levels)
+            refined = remap_transform(local, (1, (fx0, fy0)), (1, (mx0, my0)))
+            # the refined transform of the region on a 3x3 grid votes for
+            # the final similarity
+            for y in np.linspace(fy0, fy1 - 1, 3):
+                for x in np.linspace(fx0, fx1 - 1, 3):
+                    fixed_pts.append((x, y))
+                    moving_pts.append(refined.TransformPoint((x, y)))
+                    roi_index.append(i)
+
+        self.rois = list(rois)
+        self.roi_inlier = np.zeros(len(rois), dtype=bool)
+        if len(fixed_pts) == 0:
+            return transform
+        similarity, mirror, _, inlier = estimate_similarity(
+            np.array(fixed_pts),
+            np.array(moving_pts),
+            method="ransac",
+            mirror="always" if flip is not None else "never",
+            threshold=self._param_dict["roi_threshold"].value,
+        )
+        roi_index = np.array(roi_index)
+        for i in range(len(rois)):
+            self.roi_inlier[i] = np.all(inlier[roi_index == i]) if np.any(roi_index == i) else False
+        level_transform = similarity_to_sitk(
+            similarity,
+            mirror,
+            ((fixed.shape[-1] - 1) / 2, (fixed.shape[-2] - 1) / 2),
+            ((mw - 1) / 2, (mh - 1) / 2),
+        )
+        return rescale_transform(level_transform, fixed_factor, moving_factor)
+
+
+def _as_levels(levels: Levels) -> List[Any]:
+    if isinstance(levels, str):
+        # memory mapped where possible and shared through the image cache
+        return load_image(levels).levels
+    if hasattr(levels, "shape"):
+        return [levels]
+    return list(levels)
+
+
+def _level_factor(levels: Sequence[Any], level: int) -> float:
+    """Downsample factor of a level relative to the full resolution level"""
+    full = levels[0].shape[-2:]
+    shape = levels[level].shape[-2:]
+    return float(np.mean([full[0] / shape[0], full[1] / shape[1]]))
+
+
+def _coarse_level(levels: Sequence[Any], max_size: int) -> Tuple[np.ndarray, float]:
+    """The finest level no larger than max_size in memory and its downsample
+    factor, block averaged from the coarsest level if all are larger"""
+    for level in range(len(levels)):
+        if max(levels[level].shape[-2:]) <= max_size:
+            return (np.asarray(levels[level]), _level_factor(levels, level))
+    coarsest = levels[-1]
+    factor = int(np.ceil(max(coarsest.shape[-2:]) / max_size))
+    small = _block_mean(coarsest, factor)
+    full = levels[0].shape[-2:]
+    return (small, float(np.mean([full[0] / small.shape[-2], full[1] / small.shape[-1]])))
+
+
+def _downsample_points(points: np.ndarray, factor: float) -> np.ndarray:
+    return (np.asarray(points, dtype=np.float64) + 0.5) / factor - 0.5
+
+
+def _window_std(img: np.ndarray, win: int) -> np.ndarray:
+    """Standard deviation of every win x win window from integral images,
+    indexed by the top left pixel of the window"""
+    def window_sum(a):
+        c = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+        c[1:, 1:] = np.cumsum(np.cumsum(a, axis=0), axis=1)
+        return c[win:, win:] - c[:-win, win:] - c[win:, :-win] + c[:-win, :-win]
+
+    n = win * win
+    mean = window_sum(img) / n
+    var = window_sum(img * img) / n - mean * mean
+    return np.sqrt(np.maximum(var, 0))
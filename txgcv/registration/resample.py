@@ -0,0 +1,110 @@
+import numpy as np
+import SimpleITK as sitk
+from typing import Tuple
+
+
+def _border_points(y0: int, y1: int, x0: int, x1: int, num: int = 8) -> np.ndarray:
+    ys = np.linspace(y0 - 0.5, y1 - 0.5, num)
+    xs = np.linspace(x0 - 0.5, x1 - 0.5, num)
+    return np.concatenate(
+        [
+            np.stack([xs, np.full(num, y0 - 0.5)], axis=1),
+            np.stack([xs, np.full(num, y1 - 0.5)], axis=1),
+            np.stack([np.full(num, x0 - 0.5), ys], axis=1),
+            np.stack([np.full(num, x1 - 0.5), ys], axis=1),
+        ]
+    )
+
+
+def resample_tiled(
+    moving: np.ndarray,
+    transform: sitk.Transform,
+    output_shape: Tuple[int, int],
+    tile_size: int = 4096,
+    out: np.ndarray = None,
+    moving_spacing: float = 1.0,
+    moving_origin: Tuple[float, float] = (0.0, 0.0),
+    output_spacing: float = 1.0,
+    output_origin: Tuple[float, float] = (0.0, 0.0),
+    default_value: float = 0.0,
+    interpolator: int = sitk.sitkLinear,
+) -> np.ndarray:
+    """Resample all channels of a moving image onto an output grid tile by tile
+
+    For every output tile only the region of the moving image the tile maps
+    into is read, so ``moving`` and ``out`` may be memory mapped arrays larger
+    than memory. Pixel ``(i, j)`` of the moving image sits at the physical
+    point ``moving_origin + (j * moving_spacing, i * moving_spacing)``, pixel
+    ``(i, j)`` of the output at ``output_origin + (j * output_spacing, i * output_spacing)``.
+
+    Args:
+        moving (np.ndarray): HxW or CxHxW moving image.
+        transform (sitk.Transform): transform from output to moving physical space.
+        output_shape (tuple): height and width of the output grid.
+        tile_size (int): edge length of output tiles.
+        out (np.ndarray, optional): HxW or CxHxW float array written in place,
+            a float32 array is allocated if not given.
+        moving_spacing (float): pixel spacing of the moving image.
+        moving_origin (tuple): physical x, y of the first moving pixel.
+        output_spacing (float): pixel spacing of the output grid.
+        output_origin (tuple): physical x, y of the first output pixel.
+        default_value (float): value of pixels mapped outside the moving image.
+        interpolator (int): SimpleITK interpolator.
+
+    Returns:
+        The resampled image, ``out`` if given.
+    """
+    multichannel = moving.ndim == 3
+    mh, mw = moving.shape[-2:]
+    h, w = output_shape
+    if out is None:
+        out = np.empty(moving.shape[:-2] + (h, w), dtype=np.float32)
+
+    for y0 in range(0, h, tile_size):
+        for x0 in range(0, w, tile_size):
+            y1, x1 = min(y0 + tile_size, h), min(x0 + tile_size, w)
+            # bounding box of the moving region the tile maps into
+            points = _border_points(y0, y1, x0, x1) * output_spacing
+            points = points + np.asarray(output_origin)
+            mapped = np.array([transform.TransformPoint(tuple(p)) for p in points])
+            mapped = (mapped - np.asarray(moving_origin)) / moving_spacing
+            mx0 = max(int(np.floor(mapped[:, 0].min())) - 1, 0)
+            mx1 = min(int(np.ceil(mapped[:, 0].max())) + 2, mw)
+            my0 = max(int(np.floor(mapped[:, 1].min())) - 1, 0)
+            my1 = min(int(np.ceil(mapped[:, 1].max())) + 2, mh)
+            if mx1 <= mx0 or my1 <= my0:
+                out[..., y0:y1, x0:x1] = default_value
+                continue
+
+            region = np.asarray(moving[..., my0:my1, mx0:mx1], dtype=np.float32)
+            if multichannel:
+                region_img = sitk.GetImageFromArray(np.moveaxis(region, 0, -1), isVector=True)
+            else:
+                region_img = sitk.GetImageFromArray(region)
+            region_img.SetSpacing([moving_spacing, moving_spacing])
+            region_img.SetOrigin(
+                [
+                    moving_origin[0] + mx0 * moving_spacing,
+                    moving_origin[1] + my0 * moving_spacing,
+                ]
+            )
+
+            resampled = sitk.Resample(
+                region_img,
+                [x1 - x0, y1 - y0],
+                transform,
+                interpolator,
+                [
+                    output_origin[0] + x0 * output_spacing,
+                    output_origin[1] + y0 * output_spacing,
+                ],
+                [output_spacing, output_spacing],
+                [1.0, 0.0, 0.0, 1.0],
+                default_value,
+                region_img.GetPixelID(),
+            )
+            tile = sitk.GetArrayViewFromImage(resampled)
+            if multichannel:
+                tile = np.moveaxis(tile, -1, 0)
+            out[..., y0:y1, x0:x1] = tile
+    return out
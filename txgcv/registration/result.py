@@ -0,0 +1,125 @@
+import numpy as np
+import SimpleITK as sitk
+from typing import Tuple
+from txgcv.registration.resample import resample_tiled
+from txgcv.registration.telemetry import RegistTelemetry
+from txgcv.registration.transform import save_transform
+
+
+Region = Tuple[slice, slice]
+
+
+class RegistResult(object):
+    """Transform and metrics of a registration
+
+    Resampled, checkerboard and overlay images are only computed when
+    requested, at the requested resolution and region of the fixed image.
+    ``scale`` is the output resolution relative to the fixed image (0.25 is a
+    4 times downsampled output) and ``region`` a pair of row and column slices
+    in full resolution fixed image pixels. Results of a keypoint
+    initialization hold the residual of every keypoint in moving image pixels
+    and its inlier mask.
+    """
+
+    def __init__(
+        self,
+        transform: sitk.Transform,
+        moving: np.ndarray,
+        fixed: np.ndarray,
+        moving_channel: int = None,
+        fixed_channel: int = None,
+        telemetry: RegistTelemetry = None,
+        tile_size: int = 4096,
+        keypoint_residual: np.ndarray = None,
+        keypoint_inlier: np.ndarray = None,
+    ) -> None:
+        self.transform = transform
+        self.telemetry = telemetry
+        self.keypoint_residual = keypoint_residual
+        self.keypoint_inlier = keypoint_inlier
+        self._moving = moving
+        self._fixed = fixed
+        self._moving_channel = moving_channel
+        self._fixed_channel = fixed_channel
+        self._tile_size = tile_size
+
+    @property
+    def metric(self) -> float:
+        if self.telemetry is None:
+            return float("nan")
+        return self.telemetry.final_metric
+
+    def save_transform(self, file: str) -> None:
+        """Save the transform as .tfm or json / yaml, see :func:`save_transform`"""
+        save_transform(self.transform, file)
+
+    def resample(
+        self, scale: float = 1.0, region: Region = None, out: np.ndarray = None
+    ) -> np.ndarray:
+        """All channels of the moving image resampled onto the fixed image grid"""
+        return self._resample(self._moving, self.transform, scale, region, out)
+
+    def fixed(self, scale: float = 1.0, region: Region = None) -> np.ndarray:
+        """Registration channel of the fixed image on the output grid"""
+        return self._resample(
+            _channel(self._fixed, self._fixed_channel),
+            sitk.Transform(2, sitk.sitkIdentity),
+            scale,
+            region,
+        )
+
+    def checkerboard(
+        self, scale: float = 1.0, region: Region = None, checker_pattern: int = 20
+    ) -> np.ndarray:
+        """Checkerboard of the fixed and the registered moving registration channel"""
+        moving = self._resample(
+            _channel(self._moving, self._moving_channel), self.transform, scale, region
+        )
+        checker_img = sitk.CheckerBoard(
+            sitk.GetImageFromArray(self.fixed(scale, region)),
+            sitk.GetImageFromArray(moving),
+            [checker_pattern, checker_pattern],
+        )
+        # a writable array owning its memory, one copy of the output size
+        return sitk.GetArrayFromImage(checker_img)
+
+    def overlay(self, scale: float = 1.0, region: Region = None) -> np.ndarray:
+        """HxWx3 overlay, registered moving channel in magenta and fixed in green"""
+        moving = self._resample(
+            _channel(self._moving, self._moving_channel), self.transform, scale, region
+        )
+        fixed = self.fixed(scale, region)
+        moving = moving / max(float(moving.max()), 1e-6)
+        fixed = fixed / max(float(fixed.max()), 1e-6)
+        return np.stack([moving, fixed, moving], axis=-1)
+
+    def _resample(
+        self,
+        img: np.ndarray,
+        transform: sitk.Transform,
+        scale: float,
+        region: Region,
+        out: np.ndarray = None,
+    ) -> np.ndarray:
+        h, w = self._fixed.shape[-2:]
+        if region is None:
+            region = (slice(None), slice(None))
+        y0, y1, _ = region[0].indices(h)
+        x0, x1, _ = region[1].indices(w)
+        shape = (max(int(round((y1 - y0) * scale)), 1), max(int(round((x1 - x0) * scale)), 1))
+        spacing = 1.0 / scale
+        # center the output pixels on the full resolution pixels they cover
+        origin = (x0 + (spacing - 1) / 2, y0 + (spacing - 1) / 2)
+        return resample_tiled(
+            img,
+            transform,
+            shape,
+            tile_size=self._tile_size,
+            out=out,
+            output_spacing=spacing,
+            output_origin=origin,
+        )
+
+
+def _channel(img: np.ndarray, channel: int) -> np.ndarray:
+    return img if img.ndim == 2 else img[channel]
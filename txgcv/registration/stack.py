@@ -0,0 +1,227 @@
+import os
+import tempfile
+import numpy as np
+import SimpleITK as sitk
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from txgcv.util import array_digest, param_digest
+from txgcv.util.memmap import spill_array, open_image
+from txgcv.registration.img_regist import ImageRegister
+from txgcv.registration.batch import KeypointPair, _regist_worker
+from txgcv.registration.resample import resample_tiled
+
+
+Section = Union[str, np.ndarray]
+
+
+class StackResult(object):
+    """Transforms of a registered section stack and lazy access to the
+    sections aligned onto the reference section grid"""
+
+    def __init__(
+        self,
+        sections: Sequence[Section],
+        reference: int,
+        pair_transforms: List[sitk.Transform],
+        pair_metrics: List[Dict[str, Any]],
+        tile_size: int = 4096,
+    ) -> None:
+        self._sections = list(sections)
+        self.reference = reference
+        self.pair_transforms = pair_transforms
+        self.pair_metrics = pair_metrics
+        self._tile_size = tile_size
+        self.transforms = [
+            compose_to_reference(pair_transforms, reference, k) for k in range(len(sections))
+        ]
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def __getitem__(self, k: int) -> np.ndarray:
+        return self.section(k)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for k in range(len(self)):
+            yield self.section(k)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        ref = self._open(self.reference)
+        return (len(self),) + tuple(ref.shape)
+
+    def section(self, k: int, out: np.ndarray = None) -> np.ndarray:
+        """Section k resampled onto the reference section grid"""
+        img = self._open(k)
+        return resample_tiled(
+            img,
+            self.transforms[k],
+            self._open(self.reference).shape[-2:],
+            tile_size=self._tile_size,
+            out=out,
+        )
+
+    def write(self, path: str, dtype: np.dtype = np.float32) -> np.ndarray:
+        """Write the aligned stack to a memory mapped ``.npy`` file one section
+        at a time
+
+        Returns:
+            The memory mapped stack.
+        """
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=self.shape)
+        for k in range(len(self)):
+            if out.dtype == np.float32:
+                self.section(k, out=out[k])
+            else:
+                out[k] = self.section(k)
+            out.flush()
+        return out
+
+    def _open(self, k: int) -> np.ndarray:
+        section = self._sections[k]
+        return open_image(section) if isinstance(section, str) else section
+
+
+class StackRegister(object):
+    """Registration of consecutive sections of a stack
+
+    Every adjacent pair is registered in parallel on a process pool (see
+    :func:`batch_regist`), section ``k`` as fixed and ``k + 1`` as moving, and
+    the pair transforms are composed to map the reference section onto every
+    section. The register remembers the inputs of every pair, so registering
+    the stack again only reruns the pairs with a changed section, keypoints
+    or parameters. With ``cache_dir`` the pair results also persist across
+    sessions and processes in a :class:`RegistCache`.
+
+    Args:
+        param_dict (dict, optional): parameter values of :class:`ImageRegister`,
+            the current class parameters are used if not given.
+        cache_dir (str, optional): directory of a shared registration cache.
+        num_workers (int, optional): number of worker processes.
+        num_threads (int, optional): SimpleITK threads per worker.
+    """
+
+    def __init__(
+        self,
+        param_dict: Dict[str, Any] = None,
+        cache_dir: str = None,
+        num_workers: int = None,
+        num_threads: int = None,
+    ) -> None:
+        self.param_dict = param_dict
+        self.cache_dir = cache_dir
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self._pairs = {}
+
+    def regist(
+        self,
+        sections: Sequence[Section],
+        keypoints: Union[Sequence[Optional[KeypointPair]], str] = None,
+        reference: int = None,
+    ) -> StackResult:
+        """Register a stack of channel first sections or their paths
+
+        Args:
+            sections: the sections in stack order.
+            keypoints (optional): per pair ``(moving_kp, fixed_kp)`` keypoints
+                of section ``k + 1`` and ``k``, "auto" for matched features, or
+                None. A single "auto" applies to all pairs.
+            reference (int, optional): index of the reference section, the
+                middle section by default.
+
+        Returns:
+            The composed transforms and lazily aligned sections.
+        """
+        num_pair = len(sections) - 1
+        if num_pair < 1:
+            raise ValueError("a stack needs at least 2 sections")
+        if reference is None:
+            reference = len(sections) // 2
+        if keypoints is None or isinstance(keypoints, str):
+            keypoints = [keypoints] * num_pair
+        if len(keypoints) != num_pair:
+            raise ValueError(f"expect keypoints of {num_pair} pairs, got {len(keypoints)}")
+        param_value = {key: param.value for key, param in ImageRegister._param_dict.items()}
+        if self.param_dict is not None:
+            param_value.update(self.param_dict)
+
+        digests = [_section_digest(section) for section in sections]
+        params = param_digest(param_value)
+        keys = [
+            (digests[k], digests[k + 1], _keypoint_digest(keypoints[k]), params)
+            for k in range(num_pair)
+        ]
+        todo = [k for k in range(num_pair) if keys[k] not in self._pairs]
+
+        if len(todo) > 0:
+            num_cpu = os.cpu_count() or 1
+            num_workers = self.num_workers or min(num_cpu, len(todo))
+            num_threads = self.num_threads or max(1, num_cpu // num_workers)
+            with tempfile.TemporaryDirectory(prefix="regist_stack_") as input_dir:
+                srcs = {}
+
+                def src(k):
+                    if k not in srcs:
+                        srcs[k] = spill_array(sections[k], input_dir, f"section_{k}")
+                    return srcs[k]
+
+                with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                    futures = {
+                        executor.submit(
+                            _regist_worker,
+                            src(k),
+                            src(k + 1),
+                            keypoints[k],
+                            param_value,
+                            num_threads,
+                            self.cache_dir,
+                        ): k
+                        for k in todo
+                    }
+                    for future in as_completed(futures):
+                        self._pairs[keys[futures[future]]] = future.result()
+
+        # only the pairs of the latest stack are kept
+        self._pairs = {key: self._pairs[key] for key in keys}
+        pair_transforms = [self._pairs[key][0] for key in keys]
+        pair_metrics = [self._pairs[key][1] for key in keys]
+        return StackResult(
+            sections,
+            reference,
+            pair_transforms,
+            pair_metrics,
+            tile_size=param_value["resample_tile_size"],
+        )
+
+
+def compose_to_reference(
+    pair_transforms: Sequence[sitk.Transform], reference: int, k: int
+) -> sitk.Transform:
+    """Transform from reference section to section k pixel coordinates
+
+    ``pair_transforms[i]`` maps section ``i`` onto section ``i + 1``.
+    """
+    if k == reference:
+        return sitk.Transform(2, sitk.sitkIdentity)
+    if k > reference:
+        # the last transform of a composite is applied first
+        chain = [pair_transforms[i] for i in range(k - 1, reference - 1, -1)]
+    else:
+        chain = [pair_transforms[i].GetInverse() for i in range(k, reference)]
+    return sitk.CompositeTransform(chain)
+
+
+def _section_digest(section: Section) -> str:
+    if isinstance(section, str):
+        # files are identified by path, size and modification time instead of
+        # reading them
+        stat = os.stat(section)
+        return f"{os.path.abspath(section)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return array_digest(section)
+
+
+def _keypoint_digest(keypoints: Optional[KeypointPair]) -> Any:
+    if keypoints is None or isinstance(keypoints, str):
+        return keypoints
+    return tuple(array_digest(np.asarray(kp, dtype=np.float64)) for kp in keypoints)
@@ -0,0 +1,129 @@
+import time
+import numpy as np
+from typing import Callable, Dict
+
+
+class RegistTelemetry(object):
+    """Optimizer telemetry of a single registration run
+
+    Every optimizer iteration records the metric value, the optimizer
+    iteration within its level, the resolution level, the step size and the
+    wall time since the run started. Values are kept in preallocated arrays
+    which grow by doubling if the capacity is exceeded.
+    """
+
+    _fields = {
+        "metric": np.float64,
+        "iteration": np.int32,
+        "level": np.int32,
+        "step_size": np.float64,
+        "wall_time": np.float64,
+    }
+
+    def __init__(self, capacity: int = 256) -> None:
+        self._buffer = {
+            name: np.zeros(max(capacity, 1), dtype=dtype)
+            for name, dtype in self._fields.items()
+        }
+        self._size = 0
+        self._start = time.perf_counter()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def record(self, metric: float, iteration: int, level: int, step_size: float) -> None:
+        if self._size == len(self._buffer["metric"]):
+            for name, buf in self._buffer.items():
+                self._buffer[name] = np.concatenate([buf, np.zeros_like(buf)])
+        i = self._size
+        self._buffer["metric"][i] = metric
+        self._buffer["iteration"][i] = iteration
+        self._buffer["level"][i] = level
+        self._buffer["step_size"][i] = step_size
+        self._buffer["wall_time"][i] = time.perf_counter() - self._start
+        self._size += 1
+
+    @property
+    def metric(self) -> np.ndarray:
+        return self._buffer["metric"][: self._size]
+
+    @property
+    def iteration(self) -> np.ndarray:
+        return self._buffer["iteration"][: self._size]
+
+    @property
+    def level(self) -> np.ndarray:
+        return self._buffer["level"][: self._size]
+
+    @property
+    def step_size(self) -> np.ndarray:
+        return self._buffer["step_size"][: self._size]
+
+    @property
+    def wall_time(self) -> np.ndarray:
+        return self._buffer["wall_time"][: self._size]
+
+    @property
+    def final_metric(self) -> float:
+        return float(self.metric[-1]) if self._size > 0 else float("nan")
+
+    def as_dict(self) -> Dict[str, np.ndarray]:
+        return {name: buf[: self._size].copy() for name, buf in self._buffer.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, np.ndarray]) -> "RegistTelemetry":
+        """Telemetry restored from :meth:`as_dict`"""
+        size = len(data["metric"])
+        telemetry = cls(capacity=size)
+        for name, dtype in cls._fields.items():
+            telemetry._buffer[name][:size] = np.asarray(data[name], dtype=dtype)
+        telemetry._size = size
+        return telemetry
+
+
+class TelemetryStream(object):
+    """Rate limited, decimated stream of telemetry updates
+
+    Called on every optimizer iteration with the run telemetry, it forwards to
+    ``callback`` at most ``max_rate`` times per second a dict with only the
+    records added since the previous update, decimated to at most
+    ``max_points`` records. :meth:`flush` sends whatever is left at the end of
+    a run.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Dict[str, np.ndarray]], None],
+        max_rate: float = 10.0,
+        max_points: int = 50,
+    ) -> None:
+        self._callback = callback
+        self._interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self._max_points = max_points
+        self._sent = 0
+        self._last = -np.inf
+
+    def reset(self) -> None:
+        self._sent = 0
+        self._last = -np.inf
+
+    def __call__(self, telemetry: RegistTelemetry) -> None:
+        if time.perf_counter() - self._last >= self._interval:
+            self.flush(telemetry)
+
+    def flush(self, telemetry: RegistTelemetry) -> None:
+        n = len(telemetry)
+        if n <= self._sent:
+            return
+        idx = np.unique(
+            np.linspace(self._sent, n - 1, min(n - self._sent, self._max_points))
+            .round()
+            .astype(int)
+        )
+        delta = {
+            name: getattr(telemetry, name)[idx].copy() for name in RegistTelemetry._fields
+        }
+        delta["index"] = idx
+        self._sent = n
+        self._last = time.perf_counter()
+        self._callback(delta)
@@ -0,0 +1,228 @@
+import numpy as np
+import SimpleITK as sitk
+from typing import Any, Dict, Tuple, Union
+from txgcv.util import check_file_exist, load, dump
+from txgcv.util.memmap import open_image
+from txgcv.registration.resample import resample_tiled
+
+
+# formats written and read by SimpleITK itself, others go through txgcv.util.io
+_SITK_FORMATS = ["tfm", "txt", "h5", "hdf5", "mat", "xfm"]
+
+
+def save_transform(transform: sitk.Transform, file: str) -> None:
+    """Save a transform as a SimpleITK transform file (.tfm, .txt, .h5, .mat)
+    or as json / yaml holding the transform type and parameters"""
+    file_format = file.split(".")[-1]
+    if file_format in _SITK_FORMATS:
+        sitk.WriteTransform(transform, file)
+    else:
+        dump(_transform_to_dict(transform), file)
+
+
+def load_transform(file: str) -> sitk.Transform:
+    """Load a transform saved by :func:`save_transform`"""
+    check_file_exist(file)
+    file_format = file.split(".")[-1]
+    if file_format in _SITK_FORMATS:
+        return _downcast(sitk.ReadTransform(file))
+    return _transform_from_dict(load(file))
+
+
+def apply_transform(
+    img: Union[str, np.ndarray],
+    transform: Union[str, sitk.Transform],
+    output_shape: Tuple[int, int],
+    moving_scale: float = 1.0,
+    output_scale: float = 1.0,
+    out_path: str = None,
+    dtype: np.dtype = np.float32,
+    tile_size: int = 4096,
+    default_value: float = 0.0,
+    interpolator: int = sitk.sitkLinear,
+) -> np.ndarray:
+    """Apply a saved registration to an image of any resolution
+
+    The transform maps fixed to moving pixel coordinates of the images it was
+    estimated on. Instead of rewriting the transform, the target images are
+    placed in that space by their pixel spacing: ``img`` has ``moving_scale``
+    times the resolution of the registered moving image (4.0 if registered on
+    a 4 times downsampled image), the output ``output_scale`` times the
+    resolution of the registered fixed image. The image is resampled tile by
+    tile, so with an ``.npy`` path as input and ``out_path`` neither the image
+    nor the output has to fit in memory.
+
+    Args:
+        img: HxW or channel first CxHxW image, or its path.
+        transform: transform or the path of a saved transform.
+        output_shape (tuple): height and width of the output.
+        moving_scale (float): resolution of ``img`` relative to the registered
+            moving image.
+        output_scale (float): resolution of the output relative to the
+            registered fixed image.
+        out_path (str, optional): ``.npy`` file the output is memory mapped to,
+            the output is kept in memory if not given.
+        dtype (np.dtype): output data type.
+        tile_size (int): edge length of output tiles.
+        default_value (float): value of pixels mapped outside the image.
+        interpolator (int): SimpleITK interpolator.
+
+    Returns:
+        Resampled image, memory mapped if ``out_path`` is given.
+    """
+    if isinstance(img, str):
+        img = open_image(img)
+    if isinstance(transform, str):
+        transform = load_transform(transform)
+    shape = img.shape[:-2] + tuple(output_shape)
+    if out_path is None:
+        out = np.empty(shape, dtype=dtype)
+    else:
+        out = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=shape)
+
+    # pixel centers of an image with n times the resolution sit at
+    # k / n + (1 / n - 1) / 2 in pixels of the registered image
+    moving_spacing = 1.0 / moving_scale
+    output_spacing = 1.0 / output_scale
+    moving_origin = ((moving_spacing - 1) / 2,) * 2
+    output_origin = ((output_spacing - 1) / 2,) * 2
+    resample_tiled(
+        img,
+        transform,
+        output_shape,
+        tile_size=tile_size,
+        out=out,
+        moving_spacing=moving_spacing,
+        moving_origin=moving_origin,
+        output_spacing=output_spacing,
+        output_origin=output_origin,
+        default_value=default_value,
+        interpolator=interpolator,
+    )
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def rescale_transform(
+    transform: sitk.Transform, fixed_factor: float, moving_factor: float
+) -> sitk.Transform:
+    """Transform estimated on downsampled images expressed in full resolution pixels
+
+    Args:
+        transform (sitk.Transform): transform between pixel coordinates of a
+            fixed and a moving image downsampled by ``fixed_factor`` and
+            ``moving_factor``. Factors below 1 go from full to lower resolution.
+        fixed_factor (float): downsample factor of the fixed image.
+        moving_factor (float): downsample factor of the moving image.
+
+    Returns:
+        The same mapping between full resolution pixel coordinates.
+    """
+    # pixel centers of the downsampled image sit at f * (x + 0.5) - 0.5
+    fixed_map = (fixed_factor, 0.5 * fixed_factor - 0.5)
+    moving_map = (moving_factor, 0.5 * moving_factor - 0.5)
+    return remap_transform(transform, fixed_map, moving_map)
+
+
+def remap_transform(
+    transform: sitk.Transform,
+    fixed_map: Tuple[float, Any],
+    moving_map: Tuple[float, Any],
+) -> sitk.Transform:
+    """Express a transform in new fixed and moving coordinates
+
+    The new coordinates are ``scale * x + offset`` of the old ones for the
+    ``(scale, offset)`` maps, offsets are scalars or (x, y) pairs. Similarity,
+    Euler, affine and translation transforms and composites of them are
+    supported.
+    """
+    transform = _downcast(transform)
+    if isinstance(transform, sitk.CompositeTransform):
+        # the last transform is applied first and maps from the fixed image,
+        # the others map within moving image coordinates
+        n = transform.GetNumberOfTransforms()
+        return sitk.CompositeTransform(
+            [
+                remap_transform(
+                    transform.GetNthTransform(i),
+                    fixed_map if i == n - 1 else moving_map,
+                    moving_map,
+                )
+                for i in range(n)
+            ]
+        )
+    fixed_scale, fixed_offset = fixed_map[0], np.broadcast_to(fixed_map[1], 2)
+    moving_scale, moving_offset = moving_map[0], np.broadcast_to(moving_map[1], 2)
+
+    if isinstance(transform, sitk.TranslationTransform):
+        matrix, center = np.eye(2), np.zeros(2)
+    else:
+        matrix = np.array(transform.GetMatrix()).reshape(2, 2)
+        center = np.array(transform.GetCenter())
+
+    def mapped(x):
+        old = (np.asarray(x) - fixed_offset) / fixed_scale
+        return moving_scale * np.array(transform.TransformPoint(tuple(old))) + moving_offset
+
+    new_center = fixed_scale * center + fixed_offset
+    translation = mapped(new_center) - new_center
+    ratio = moving_scale / fixed_scale
+    if isinstance(transform, sitk.Similarity2DTransform):
+        new = sitk.Similarity2DTransform(transform)
+        new.SetScale(transform.GetScale() * ratio)
+    elif isinstance(transform, sitk.Euler2DTransform) and ratio == 1:
+        new = sitk.Euler2DTransform(transform)
+    elif isinstance(transform, sitk.TranslationTransform) and ratio == 1:
+        return sitk.TranslationTransform(2, translation.tolist())
+    else:
+        new = sitk.AffineTransform(2)
+        new.SetMatrix((matrix * ratio).flatten().tolist())
+    new.SetCenter(new_center.tolist())
+    new.SetTranslation(translation.tolist())
+    return new
+
+
+def _transform_to_dict(transform: sitk.Transform) -> Dict[str, Any]:
+    transform = _downcast(transform)
+    if isinstance(transform, sitk.CompositeTransform):
+        return {
+            "transform": transform.GetName(),
+            "dimension": transform.GetDimension(),
+            "transforms": [
+                _transform_to_dict(transform.GetNthTransform(i))
+                for i in range(transform.GetNumberOfTransforms())
+            ],
+        }
+    return {
+        "transform": transform.GetName(),
+        "dimension": transform.GetDimension(),
+        "parameters": list(transform.GetParameters()),
+        "fixed_parameters": list(transform.GetFixedParameters()),
+    }
+
+
+def _transform_from_dict(data: Dict[str, Any]) -> sitk.Transform:
+    name = data["transform"]
+    if name == "CompositeTransform":
+        transform = sitk.CompositeTransform(data["dimension"])
+        for sub in data["transforms"]:
+            transform.AddTransform(_transform_from_dict(sub))
+        return transform
+    if not hasattr(sitk, name):
+        raise ValueError(f"unknown transform type {name}")
+    transform_type = getattr(sitk, name)
+    # dimension specific types (Similarity2DTransform) take no dimension
+    try:
+        transform = transform_type()
+    except TypeError:
+        transform = transform_type(data["dimension"])
+    transform.SetFixedParameters(data["fixed_parameters"])
+    transform.SetParameters(data["parameters"])
+    return transform
+
+
+def _downcast(transform: sitk.Transform) -> sitk.Transform:
+    if type(transform) is sitk.Transform:
+        return transform.Downcast()
+    return transform
@@ -1,3 +1,5 @@
+from txgcv.segmentation.tissue_mask import TissueDetector, TissueMask
 from txgcv.segmentation.color_deconv import ColorDeconvSvd
+from txgcv.segmentation.batch import batch_color_deconv
 
-__all__ = ["ColorDeconvSvd"]
\ No newline at end of file
+__all__ = ["ColorDeconvSvd", "TissueDetector", "TissueMask", "batch_color_deconv"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from txgcv.segmentation import ColorDeconvSvd, batch_color_deconv
+from txgcv.segmentation.batch import _deconv_worker
+
+
+_STAIN_MATRIX = np.array([[0.65, 0.70, 0.29], [0.07, 0.99, 0.11]])
+_STAIN_MATRIX /= np.linalg.norm(_STAIN_MATRIX, axis=1, keepdims=True)
+
+
+def _he_image(h=96, w=80, seed=0):
+    rng = np.random.default_rng(seed)
+    od = rng.uniform(0, 1.5, (h, w, 2)) @ _STAIN_MATRIX
+    return np.clip(np.rint(256 * np.exp(-od) - 1), 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def fit_calls(monkeypatch):
+    # records the estimator, tile size and sampling of every fit
+    calls = []
+    fit = ColorDeconvSvd.fit
+
+    def record(self, sample_tile=False):
+        param = self.parameter
+        calls.append((param["estimator"].value, param["tile_size"].value, sample_tile))
+        return fit(self, sample_tile)
+
+    monkeypatch.setattr(ColorDeconvSvd, "fit", record)
+    return calls
+
+
+def test_worker_streams_images_over_budget(tmp_path, fit_calls):
+    src = str(tmp_path / "img.npy")
+    np.save(src, _he_image())
+    # 144 bytes per float32 pixel of a uint8 image, tiles of 32 x 32 pixels
+    _deconv_worker(src, str(tmp_path / "out"), {}, None, 144 * 32 * 32)
+    assert fit_calls == [("covariance", 32, True)]
+    assert (tmp_path / "out" / "hemo_rgb.npy").exists()
+
+
+def test_worker_fits_whole_image_within_budget(tmp_path, fit_calls):
+    src = str(tmp_path / "img.npy")
+    np.save(src, _he_image())
+    _deconv_worker(src, str(tmp_path / "out"), {}, None, 2**30)
+    assert fit_calls == [("svd", int(np.sqrt(2**30 / 144)), False)]
+
+
+def test_batch_color_deconv(tmp_path):
+    images = [_he_image(seed=0), _he_image(64, 72, seed=1)]
+    param = {"output_mode": "concentration+rgb", "tile_size": 32}
+    results = dict(
+        batch_color_deconv(
+            images, str(tmp_path), num_workers=2, param_dict=param, stain_matrix=_STAIN_MATRIX
+        )
+    )
+    assert sorted(results) == [0, 1]
+    algo = ColorDeconvSvd()
+    algo.set_parameter(param)
+    algo.set_stain_matrix(_STAIN_MATRIX)
+    for i, img in enumerate(images):
+        expected = algo.transform(img)
+        for mode in ["concentration", "rgb"]:
+            for x, y in zip(results[i][mode], expected[mode]):
+                assert isinstance(x, np.memmap)
+                np.testing.assert_allclose(x, y, atol=1e-6)
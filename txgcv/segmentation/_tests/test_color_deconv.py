@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+from txgcv.segmentation import ColorDeconvSvd, TissueMask
+
+
+_STAIN_MATRIX = np.array([[0.65, 0.70, 0.29], [0.07, 0.99, 0.11]])
+_STAIN_MATRIX /= np.linalg.norm(_STAIN_MATRIX, axis=1, keepdims=True)
+
+
+def _he_image(h=96, w=80, seed=0):
+    # RGB image of two known stains, the left quarter is background
+    rng = np.random.default_rng(seed)
+    concentration = rng.uniform(0, 1.5, (h, w, 2))
+    concentration[:, : w // 4] = 0
+    od = concentration @ _STAIN_MATRIX
+    return np.clip(np.rint(256 * np.exp(-od) - 1), 0, 255).astype(np.uint8)
+
+
+def test_tiled_matches_in_memory(tmp_path):
+    algo = ColorDeconvSvd(_he_image())
+    algo.set_parameter({"output_mode": "concentration+od+rgb", "tile_size": 32})
+    algo.fit()
+    in_memory = algo.transform()
+    tiled = algo.transform_tiled(str(tmp_path))
+    for mode in ["concentration", "od", "rgb"]:
+        for x, y in zip(in_memory[mode], tiled[mode]):
+            assert isinstance(y, np.memmap)
+            np.testing.assert_array_equal(x, y)
+    for stain in ["hemo", "eosin"]:
+        np.testing.assert_array_equal(
+            np.load(tmp_path / f"{stain}_rgb.npy"), tiled["rgb"][stain == "eosin"]
+        )
+
+
+def test_color_deconv_tiled_samples_tiles(tmp_path):
+    algo = ColorDeconvSvd(_he_image())
+    algo.set_parameter({"tile_size": 32, "num_sample_tile": 4})
+    hemo, eosin = algo.color_deconv_tiled(str(tmp_path))
+    assert hemo.shape == eosin.shape == (96, 80, 3)
+    np.testing.assert_allclose(algo.stain_matrix, _STAIN_MATRIX, atol=0.05)
+
+
+def test_fit_recovers_stain_matrix():
+    algo = ColorDeconvSvd(_he_image())
+    np.testing.assert_allclose(algo.fit(), _STAIN_MATRIX, atol=0.05)
+
+
+def test_fit_is_cached_across_output_parameters():
+    algo = ColorDeconvSvd(_he_image())
+    fitted = algo.fit()
+    algo.set_parameter({"output_mode": "concentration", "output_dtype": "float16"})
+    # a cache hit returns the stored matrix itself
+    assert ColorDeconvSvd(_he_image()).fit() is fitted
+    algo.set_parameter({"od_threshold": 0.2})
+    assert algo.fit() is not fitted
+
+
+def test_stain_matrix_save_load_round_trip(tmp_path):
+    img = _he_image()
+    algo = ColorDeconvSvd(img)
+    algo.fit()
+    filename = str(tmp_path / "stain_matrix.json")
+    algo.save_stain_matrix(filename)
+
+    loaded = ColorDeconvSvd(img)
+    loaded.load_stain_matrix(filename)
+    np.testing.assert_array_equal(loaded.stain_matrix, algo.stain_matrix)
+    for x, y in zip(loaded.transform(), algo.transform()):
+        np.testing.assert_array_equal(x, y)
+
+
+def test_unfitted_stain_matrix_raises(tmp_path):
+    algo = ColorDeconvSvd(_he_image())
+    with pytest.raises(ValueError):
+        algo.save_stain_matrix(str(tmp_path / "stain_matrix.json"))
+    with pytest.raises(ValueError):
+        algo.transform()
+
+
+def test_covariance_estimator_matches_svd():
+    algo = ColorDeconvSvd(_he_image())
+    svd = algo.fit()
+    algo.set_parameter({"estimator": "covariance", "tile_size": 32})
+    np.testing.assert_allclose(algo.fit(), svd, atol=0.02)
+    np.testing.assert_allclose(algo.fit(sample_tile=True), svd, atol=0.02)
+
+
+def test_uint8_lookup_table_matches_float_path():
+    img = _he_image()
+    algo = ColorDeconvSvd(img)
+    algo.set_parameter({"output_mode": "concentration+od+rgb"})
+    algo.set_stain_matrix(_STAIN_MATRIX)
+    lut = algo.transform(img)
+    exact = algo.transform(img.astype(np.float64))
+    for mode in ["concentration", "od", "rgb"]:
+        for x, y in zip(lut[mode], exact[mode]):
+            assert x.dtype == np.float32
+            assert y.dtype == np.float64
+            np.testing.assert_allclose(x, y, rtol=1e-4, atol=1e-5)
+
+    fitted = algo.fit()
+    algo.set_image(img.astype(np.float64))
+    np.testing.assert_allclose(algo.fit(), fitted, atol=1e-4)
+
+
+def test_known_he_patch_keeps_hematoxylin_first():
+    # patch of the Ruifrok and Johnston H&E vectors, the stain order and the
+    # outputs are those of the original color_deconv
+    rng = np.random.default_rng(3)
+    concentration = rng.uniform(0, 1.5, (64, 64, 2))
+    od = concentration @ _STAIN_MATRIX
+    img = np.clip(np.rint(256 * np.exp(-od) - 1), 0, 255).astype(np.uint8)
+    algo = ColorDeconvSvd(img)
+    algo.set_parameter({"output_mode": "concentration+rgb", "output_dtype": "float64"})
+    algo.fit()
+    np.testing.assert_allclose(algo.stain_matrix, _STAIN_MATRIX, atol=0.02)
+    output = algo.transform()
+    for stain in range(2):
+        np.testing.assert_allclose(
+            output["concentration"][stain], concentration[..., stain], atol=0.1
+        )
+        expected = np.exp(-concentration[..., stain, None] * _STAIN_MATRIX[stain])
+        np.testing.assert_allclose(output["rgb"][stain], expected, atol=0.05)
+
+
+def test_covariance_estimator_is_independent_of_eigenvector_sign(monkeypatch):
+    algo = ColorDeconvSvd(_he_image())
+    algo.set_parameter({"estimator": "covariance"})
+    fitted = algo.fit().copy()
+    eigh = np.linalg.eigh
+    monkeypatch.setattr(np.linalg, "eigh", lambda a: (eigh(a)[0], -eigh(a)[1]))
+    algo._stain_cache.clear()
+    np.testing.assert_allclose(algo.fit(), fitted, atol=1e-3)
+
+
+def _background_mask(img):
+    # 16x16 blocks, the two left tile columns of 32 pixels are background only
+    mask = np.ones((6, 5), dtype=bool)
+    mask[:, :4] = False
+    return TissueMask(mask, 16, img.shape)
+
+
+def test_masked_tiled_matches_in_memory(tmp_path):
+    img = _he_image()
+    algo = ColorDeconvSvd(img)
+    algo.set_parameter({"output_mode": "concentration+od+rgb", "tile_size": 32})
+    algo.set_tissue_mask(_background_mask(img))
+    algo.fit()
+    in_memory = algo.transform()
+    tiled = algo.transform_tiled(str(tmp_path))
+    for mode in ["concentration", "od", "rgb"]:
+        for x, y in zip(in_memory[mode], tiled[mode]):
+            np.testing.assert_array_equal(x, y)
+    # background tiles hold zero stain
+    for stain in range(2):
+        np.testing.assert_array_equal(in_memory["concentration"][stain][:, :64], 0)
+        np.testing.assert_array_equal(in_memory["od"][stain][:, :64], 0)
+        np.testing.assert_array_equal(in_memory["rgb"][stain][:, :64], 1)
+
+
+def test_mask_must_match_image():
+    algo = ColorDeconvSvd(_he_image())
+    with pytest.raises(ValueError):
+        algo.set_tissue_mask(TissueMask(np.ones((3, 3), dtype=bool), 16, (48, 48)))
+
+
+def test_empty_tissue_mask_raises():
+    img = _he_image()
+    algo = ColorDeconvSvd(img)
+    algo.set_tissue_mask(TissueMask(np.zeros((6, 5), dtype=bool), 16, img.shape))
+    with pytest.raises(ValueError):
+        algo.fit()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+from txgcv.segmentation.color_deconv import ColorDeconvSvd, StainPair
+from txgcv.util.memmap import spill_array, open_image
+
+
+# peak working set per pixel of a deconvolution tile measured with every
+# output mode: optical density, concentration, two od and two rgb
+# reconstructions and their output conversion, which also bounds the
+# streaming stain estimation of a tile
+_BYTES_PER_PIXEL = {np.dtype(np.float64): 288, np.dtype(np.float32): 144}
+
+
+def _deconv_worker(
+    src: str,
+    out_dir: str,
+    param_value: Dict[str, Any],
+    stain_matrix: np.ndarray,
+    memory_budget: int,
+) -> Tuple[str, List[str]]:
+    algo = ColorDeconvSvd()
+    algo.set_parameter(param_value)
+    algo.set_image(open_image(src))
+
+    h, w, _ = algo._img.shape
+    bytes_per_pixel = _BYTES_PER_PIXEL[algo._work_dtype(algo._img)]
+    tile_size = int(np.sqrt(memory_budget / bytes_per_pixel))
+    algo.set_parameter({"tile_size": max(16, tile_size)})
+
+    if stain_matrix is None:
+        if h * w * bytes_per_pixel > memory_budget:
+            # sampled tiles concatenated for the svd would exceed the budget,
+            # the streaming estimator holds a single tile at a time
+            algo.set_parameter({"estimator": "covariance"})
+            algo.fit(sample_tile=True)
+        else:
+            algo.fit()
+    else:
+        algo.set_stain_matrix(stain_matrix)
+    algo.transform_tiled(out_dir)
+    return (out_dir, algo._output_modes())
+
+
+def batch_color_deconv(
+    images: Iterable[Union[str, np.ndarray]],
+    out_dir: str = None,
+    num_workers: int = None,
+    memory_budget: int = 2 * 1024 ** 3,
+    param_dict: Dict[str, Any] = None,
+    stain_matrix: np.ndarray = None,
+) -> Iterator[Tuple[int, Union[StainPair, Dict[str, StainPair]]]]:
+    """Color deconvolution of many images on a process pool
+
+    Images are handed to the workers as file paths and every worker writes
+    its result into memory mapped ``.npy`` files, so no pixel data is pickled
+    between processes. In-memory arrays are spilled to ``.npy`` first.
+
+    Args:
+        images: image file paths or RGB arrays.
+        out_dir (str, optional): output directory, one sub directory per
+            image. A temporary directory is created if not given.
+        num_workers (int, optional): number of worker processes, defaults to
+            the number of CPUs.
+        memory_budget (int): approximate peak memory in bytes of each worker,
+            which decides the deconvolution tile size. Images which do not
+            fit the budget are fitted with the streaming covariance estimator.
+        param_dict (dict, optional): parameter values of :class:`ColorDeconvSvd`,
+            the current class parameters are used if not given.
+        stain_matrix (np.ndarray, optional): fitted stain matrix applied to
+            every image instead of fitting each image separately.
+
+    Yields:
+        Index of the image in ``images`` and its memory mapped result, in the
+        order the images finish.
+    """
+    if out_dir is None:
+        out_dir = tempfile.mkdtemp(prefix="color_deconv_batch_")
+    os.makedirs(out_dir, exist_ok=True)
+    param_value = {key: param.value for key, param in ColorDeconvSvd._param_dict.items()}
+    if param_dict is not None:
+        param_value.update(param_dict)
+
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix="_input_") as input_dir:
+        sources = [spill_array(img, input_dir, str(i)) for i, img in enumerate(images)]
+
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {
+                executor.submit(
+                    _deconv_worker,
+                    src,
+                    os.path.join(out_dir, str(i)),
+                    param_value,
+                    stain_matrix,
+                    memory_budget,
+                ): i
+                for i, src in enumerate(sources)
+            }
+            for future in as_completed(futures):
+                result_dir, modes = future.result()
+                output = {
+                    mode: tuple(
+                        np.load(os.path.join(result_dir, f"{stain}_{mode}.npy"), mmap_mode="r")
+                        for stain in ["hemo", "eosin"]
+                    )
+                    for mode in modes
+                }
+                if len(output) == 1:
+                    output = next(iter(output.values()))
+                yield (futures[future], output)
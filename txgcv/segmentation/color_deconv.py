@@ -1,6 +1,20 @@
+import os
+import tempfile
 import numpy as np
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 from txgcv.base import Algorithm, Parameter
+from txgcv.segmentation.tissue_mask import TissueMask
+from txgcv.util import array_digest, image_digest, param_digest, load, dump
+
+
+# optical density of every possible 8 bit intensity, -log((i + 1) / 256)
+_OD_LUT = (-np.log((np.arange(256, dtype=np.float64) + 1) / 256)).astype(np.float32)
+# largest optical density an 8 bit pixel can have, used to quantize od and
+# concentration outputs to uint8
+_OD_MAX = float(np.log(256))
+
+StainPair = Tuple[np.ndarray, np.ndarray]
 
 
 class ColorDeconvSvd(Algorithm):
@@ -30,11 +44,64 @@ class ColorDeconvSvd(Algorithm):
             val_range=[1, np.inf],
             info="pixel sampling rate for single value decomposition",
         ),
+        "tile_size": Parameter(
+            value=1024,
+            val_type=int,
+            val_range=[16, np.inf],
+            info="edge length in pixel of the tiles used by tiled color deconvolution",
+        ),
+        "num_sample_tile": Parameter(
+            value=16,
+            val_type=int,
+            val_range=[1, np.inf],
+            info="number of tiles sampled to estimate stain vectors in tiled color deconvolution",
+        ),
+        "estimator": Parameter(
+            value="svd",
+            val_type=str,
+            options=["svd", "covariance"],
+            info="stain vector estimation engine, svd on sampled pixels or streaming od covariance with angle histogram",
+        ),
+        "num_angle_bin": Parameter(
+            value=4096,
+            val_type=int,
+            val_range=[16, np.inf],
+            info="number of histogram bins to approximate angle percentile for covariance estimator",
+        ),
+        "output_mode": Parameter(
+            value="rgb",
+            val_type=str,
+            options=[
+                "rgb",
+                "od",
+                "concentration",
+                "concentration+rgb",
+                "concentration+od",
+                "od+rgb",
+                "concentration+od+rgb",
+            ],
+            info="representation of deconvolution output, combined with + for several outputs",
+        ),
+        "output_dtype": Parameter(
+            value="auto",
+            val_type=str,
+            options=["auto", "float64", "float32", "float16", "uint8"],
+            info="dtype of deconvolution output, auto keeps the working precision",
+        ),
     }
 
+    # fitted stain matrices shared by all instances, keyed by image digest,
+    # parameters and fitting mode
+    _stain_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+    _stain_cache_size: int = 256
+
     def __init__(self, img: np.ndarray = None) -> None:
         super().__init__()
-        self._img = img
+        self._img = None
+        self._stain_matrix = None
+        self._tissue_mask = None
+        if img is not None:
+            self.set_image(img)
 
     def set_image(self, img: np.ndarray) -> None:
         h, w, c = img.shape
@@ -43,16 +110,323 @@ class ColorDeconvSvd(Algorithm):
             img = np.swapaxes(img, 1, 2)
         elif c != 3:
             raise ValueError(f"image must have RGB channels but get {c} channels")
-        self._img = (img + 1) / 256
+        # keep the (possibly memory mapped) input as is, conversion to optical
+        # density is done on demand so that tiled deconvolution never holds a
+        # full size float copy of the image
+        self._img = img
+        self._tissue_mask = None
+
+    def set_tissue_mask(self, mask: TissueMask) -> None:
+        """Restrict estimation and tiled deconvolution to tiles containing tissue
+
+        Tiles without tissue are skipped by :meth:`fit` and filled with the
+        background value (zero stain) by :meth:`transform` and
+        :meth:`transform_tiled`.
+        """
+        if mask is not None and mask.shape != self._img.shape[:2]:
+            raise ValueError(
+                f"mask of shape {mask.shape} does not match image of shape {self._img.shape[:2]}"
+            )
+        self._tissue_mask = mask
+
+    @property
+    def image(self) -> np.ndarray:
+        """current image in HxWx3 layout"""
+        return self._img
+
+    @property
+    def stain_matrix(self) -> np.ndarray:
+        """2x3 matrix with the hematoxylin and eosin optical density vectors as rows"""
+        return self._stain_matrix
+
+    def set_stain_matrix(self, stain_matrix: np.ndarray) -> None:
+        stain_matrix = np.asarray(stain_matrix, dtype=np.float64)
+        if stain_matrix.shape != (2, 3):
+            raise ValueError(f"stain matrix must be of shape (2, 3) but get {stain_matrix.shape}")
+        self._stain_matrix = stain_matrix
+
+    def snapshot(self) -> "ColorDeconvSvd":
+        """Copy with its own parameter values, image, mask and stain matrix
+
+        Parameters are shared by all instances of the class, the snapshot
+        keeps the current values so that later changes, e.g. in a parameter
+        dialog or a fit on another image, do not affect it.
+        """
+        algo = ColorDeconvSvd()
+        algo._param_dict = {key: param.copy() for key, param in self._param_dict.items()}
+        algo._img = self._img
+        algo._tissue_mask = self._tissue_mask
+        if self._stain_matrix is not None:
+            algo._stain_matrix = self._stain_matrix.copy()
+        return algo
+
+    def save_stain_matrix(self, filename: str) -> None:
+        if self._stain_matrix is None:
+            raise ValueError("stain matrix is not fitted yet")
+        dump(
+            {
+                "hematoxylin": self._stain_matrix[0].tolist(),
+                "eosin": self._stain_matrix[1].tolist(),
+            },
+            filename,
+        )
+
+    def load_stain_matrix(self, filename: str) -> None:
+        obj = load(filename)
+        self.set_stain_matrix([obj["hematoxylin"], obj["eosin"]])
+
+    def fit(self, sample_tile: bool = False) -> np.ndarray:
+        """Estimate the stain matrix of the current image
+
+        Results are cached by the image and the estimation parameters, so
+        fitting the same image again skips the estimation. Memory mapped images
+        are identified by their file and sampled rows (see
+        :func:`txgcv.util.image_digest`) instead of being read as a whole.
+
+        Args:
+            sample_tile (bool): estimate from ``num_sample_tile`` tiles spread
+                over the image instead of from the whole image.
+
+        Returns:
+            The fitted 2x3 stain matrix.
+        """
+        # only the parameters of the estimation and the tiles it reads, the
+        # output format does not change the stain matrix
+        estimation = ["od_threshold", "angle_threshold", "sampling", "estimator", "num_angle_bin"]
+        if sample_tile or self._tissue_mask is not None:
+            estimation += ["tile_size"]
+        if sample_tile:
+            estimation += ["num_sample_tile"]
+        key = (
+            image_digest(self._img),
+            param_digest({name: self._param_dict[name] for name in estimation}),
+            sample_tile,
+            None if self._tissue_mask is None else array_digest(self._tissue_mask.mask),
+        )
+        if key in self._stain_cache:
+            self._stain_cache.move_to_end(key)
+            self._stain_matrix = self._stain_cache[key]
+            return self._stain_matrix
+
+        h, w, c = self._img.shape
+        tiles = self._tiles(h, w)
+        if self._tissue_mask is not None:
+            tiles = [tile for tile in tiles if self._tissue_mask.any(*tile)]
+            if len(tiles) == 0:
+                raise ValueError("tissue mask has no tissue to estimate stain vectors")
+        if sample_tile:
+            sample_idx = np.unique(
+                np.linspace(0, len(tiles) - 1, self._param_dict["num_sample_tile"].value)
+                .round()
+                .astype(int)
+            )
+            tiles = [tiles[i] for i in sample_idx]
+
+        if self._param_dict["estimator"].value == "covariance":
+            hemo_vec, eosin_vec = self._estimate_stain_vector_streaming(
+                lambda: self._iter_tissue_od(tiles)
+            )
+        elif sample_tile or self._tissue_mask is not None:
+            hemo_vec, eosin_vec = self._estimate_stain_vector(
+                np.concatenate(list(self._iter_tissue_od(tiles)))
+            )
+        else:
+            hemo_vec, eosin_vec = self._estimate_stain_vector(
+                self._tissue_od(self._optical_density(self._img).reshape((-1, 3)))
+            )
+
+        self._stain_matrix = np.array([hemo_vec, eosin_vec])
+        self._stain_cache[key] = self._stain_matrix
+        if len(self._stain_cache) > self._stain_cache_size:
+            self._stain_cache.popitem(last=False)
+        return self._stain_matrix
 
-    def color_deconv(self) -> Tuple[np.ndarray, np.ndarray]:
+    def transform(self, img: np.ndarray = None) -> Union[StainPair, Dict[str, StainPair]]:
+        """Deconvolve an image with the fitted stain matrix
+
+        Only the outputs selected by ``output_mode`` are computed. Concentration
+        maps are HxW, od and rgb images are HxWx3. With a tissue mask, tiles
+        of the current image without tissue are filled with the background
+        value (zero stain) instead of being deconvolved.
+
+        Args:
+            img (np.ndarray, optional): RGB image to deconvolve, the current
+                image is used if not given.
+
+        Returns:
+            Hematoxylin and eosin images for a single output mode, otherwise a
+            dict of them keyed by output mode.
+        """
+        if self._stain_matrix is None:
+            raise ValueError("stain matrix is not fitted yet, call fit first")
+        if img is None:
+            img = self._img
+            if self._tissue_mask is not None:
+                h, w, c = img.shape
+                output = {
+                    mode: tuple(
+                        np.empty(
+                            (h, w) if mode == "concentration" else (h, w, c),
+                            dtype=self._output_dtype(img),
+                        )
+                        for _ in range(2)
+                    )
+                    for mode in self._output_modes()
+                }
+                self._transform_into(output)
+                return self._pack_output(output)
+        elif img.shape[0] == 3 and img.shape[2] != 3:
+            img = np.swapaxes(np.swapaxes(img, 0, 1), 1, 2)
+        h, w, c = img.shape
+        od_flat = self._optical_density(img).reshape((-1, 3))
+        result = self._deconv_od(
+            od_flat, *self._stain_matrix, dtype=self._work_dtype(img)
+        )
+        out_dtype = self._output_dtype(img)
+        result = {
+            mode: tuple(self._format_output(x, mode, h, w, out_dtype) for x in pair)
+            for mode, pair in result.items()
+        }
+        return self._pack_output(result)
+
+    def transform_tiled(self, out_dir: str = None) -> Union[StainPair, Dict[str, StainPair]]:
+        """Tile by tile deconvolution of the current image into disk backed arrays
+
+        Args:
+            out_dir (str, optional): directory of the output ``hemo_<mode>.npy``
+                and ``eosin_<mode>.npy``. A temporary directory is created if
+                not given.
+
+        Returns:
+            Memory mapped hematoxylin and eosin images, as :meth:`transform`.
+        """
+        if self._stain_matrix is None:
+            raise ValueError("stain matrix is not fitted yet, call fit first")
+        h, w, c = self._img.shape
+        out_dtype = self._output_dtype(self._img)
+        if out_dir is None:
+            out_dir = tempfile.mkdtemp(prefix="color_deconv_")
+        os.makedirs(out_dir, exist_ok=True)
+
+        output = {}
+        for mode in self._output_modes():
+            shape = (h, w) if mode == "concentration" else (h, w, c)
+            output[mode] = tuple(
+                np.lib.format.open_memmap(
+                    os.path.join(out_dir, f"{stain}_{mode}.npy"),
+                    mode="w+",
+                    dtype=out_dtype,
+                    shape=shape,
+                )
+                for stain in ["hemo", "eosin"]
+            )
+        self._transform_into(output)
+        for pair in output.values():
+            for out in pair:
+                out.flush()
+        return self._pack_output(output)
+
+    def _transform_into(self, output: Dict[str, StainPair]) -> None:
+        """Deconvolve the current image tile by tile into the output arrays,
+        tiles without tissue are filled with the background value"""
         h, w, c = self._img.shape
-        od = -np.log(self._img)
-        od_flat = od.reshape((-1, 3))
+        dtype = self._work_dtype(self._img)
+        out_dtype = self._output_dtype(self._img)
+        background = self._deconv_od(
+            np.zeros((1, 3), dtype=dtype), *self._stain_matrix, dtype=dtype
+        )
+        background = {
+            mode: tuple(self._format_output(x, mode, 1, 1, out_dtype)[0, 0] for x in pair)
+            for mode, pair in background.items()
+        }
+        for tile in self._tiles(h, w):
+            if self._tissue_mask is not None and not self._tissue_mask.any(*tile):
+                for mode, pair in background.items():
+                    for out, x in zip(output[mode], pair):
+                        out[tile] = x
+                continue
+            tile_img = self._img[tile]
+            th, tw, _ = tile_img.shape
+            od_flat = self._optical_density(tile_img).reshape((-1, 3))
+            result = self._deconv_od(od_flat, *self._stain_matrix, dtype=dtype)
+            for mode, pair in result.items():
+                for out, x in zip(output[mode], pair):
+                    out[tile] = self._format_output(x, mode, th, tw, out_dtype)
+
+    def color_deconv(self) -> Union[StainPair, Dict[str, StainPair]]:
+        self.fit()
+        return self.transform()
+
+    def color_deconv_tiled(self, out_dir: str = None) -> Union[StainPair, Dict[str, StainPair]]:
+        """Two pass color deconvolution with memory bounded by the tile size
+
+        The stain vectors are estimated from ``num_sample_tile`` tiles spread
+        evenly over the image, then every tile is deconvolved and written into
+        disk backed ``.npy`` arrays.
+
+        Args:
+            out_dir (str, optional): directory of the output ``hemo_<mode>.npy``
+                and ``eosin_<mode>.npy``. A temporary directory is created if
+                not given.
+
+        Returns:
+            Memory mapped hematoxylin and eosin images, as :meth:`transform`.
+        """
+        self.fit(sample_tile=True)
+        return self.transform_tiled(out_dir)
+
+    def _tiles(self, h: int, w: int) -> List[Tuple[slice, slice]]:
+        size = self._param_dict["tile_size"].value
+        return [
+            (slice(y, min(y + size, h)), slice(x, min(x + size, w)))
+            for y in range(0, h, size)
+            for x in range(0, w, size)
+        ]
+
+    def _work_dtype(self, img: np.ndarray) -> np.dtype:
+        # 8 bit images take the lookup table fast path and stay in float32
+        return np.dtype(np.float32) if img.dtype == np.uint8 else np.dtype(np.float64)
+
+    def _output_modes(self) -> List[str]:
+        return self._param_dict["output_mode"].value.split("+")
+
+    def _output_dtype(self, img: np.ndarray) -> np.dtype:
+        dtype = self._param_dict["output_dtype"].value
+        if dtype == "auto":
+            return self._work_dtype(img)
+        return np.dtype(dtype)
+
+    def _format_output(
+        self, x: np.ndarray, mode: str, h: int, w: int, dtype: np.dtype
+    ) -> np.ndarray:
+        x = x.reshape((h, w) if mode == "concentration" else (h, w, 3))
+        if dtype == np.uint8:
+            scale = 255 if mode == "rgb" else 255 / _OD_MAX
+            return np.clip(np.rint(x * scale), 0, 255).astype(np.uint8)
+        return x.astype(dtype, copy=False)
+
+    def _pack_output(self, output: Dict[str, StainPair]) -> Union[StainPair, Dict[str, StainPair]]:
+        if len(output) == 1:
+            return next(iter(output.values()))
+        return output
+
+    def _optical_density(self, img: np.ndarray) -> np.ndarray:
+        if img.dtype == np.uint8:
+            return _OD_LUT[img]
+        return -np.log((img + 1) / 256)
+
+    def _tissue_od(self, od_flat: np.ndarray) -> np.ndarray:
         mask = np.any(od_flat > self._param_dict["od_threshold"].value, axis=1)
-        od_flat = od_flat[mask]
+        return od_flat[mask]
 
-        u, s, vh = np.linalg.svd(od_flat[::3], full_matrices=False,)
+    def _iter_tissue_od(self, tiles: List[Tuple[slice, slice]]) -> Iterator[np.ndarray]:
+        for tile in tiles:
+            yield self._tissue_od(self._optical_density(self._img[tile]).reshape((-1, 3)))
+
+    def _estimate_stain_vector(self, od_flat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        u, s, vh = np.linalg.svd(
+            od_flat[:: self._param_dict["sampling"].value], full_matrices=False,
+        )
 
         project = np.dot(od_flat, vh[:2, :].T)
         angle = np.arctan(project[:, 1] / project[:, 0])
@@ -60,23 +434,93 @@ class ColorDeconvSvd(Algorithm):
         angle_max = np.percentile(
             angle, 100 - self._param_dict["angle_threshold"].value
         )
+        return self._stain_vector_from_angle(vh, angle_min, angle_max)
+
+    def _estimate_stain_vector_streaming(
+        self, od_chunks: Callable[[], Iterator[np.ndarray]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Stain vector estimation in O(1) memory from two passes over od chunks
+
+        The right singular vectors of the od matrix are the eigenvectors of its
+        3x3 second moment matrix, which is accumulated in the first pass. The
+        angle percentiles are read from a fixed bin histogram filled in the
+        second pass.
+        """
+        moment = np.zeros((3, 3))
+        for od_flat in od_chunks():
+            od_flat = od_flat.astype(np.float64)
+            moment += np.dot(od_flat.T, od_flat)
+        eig_val, eig_vec = np.linalg.eigh(moment)
+        vh = eig_vec[:, ::-1].T
+        # the first singular vector of the non negative od matrix has a single
+        # sign, negative as returned by svd, which the hematoxylin choice of
+        # _stain_vector_from_angle relies on. The sign of the second vector
+        # only mirrors the angles and does not change the stain vectors
+        if vh[0].sum() > 0:
+            vh[0] = -vh[0]
+
+        num_bin = self._param_dict["num_angle_bin"].value
+        hist = np.zeros(num_bin, dtype=np.int64)
+        for od_flat in od_chunks():
+            project = np.dot(od_flat, vh[:2, :].T)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                angle = np.arctan(project[:, 1] / project[:, 0])
+            angle = angle[np.isfinite(angle)]
+            idx = ((angle + np.pi / 2) / np.pi * num_bin).astype(np.int64)
+            hist += np.bincount(np.clip(idx, 0, num_bin - 1), minlength=num_bin)
+
+        cdf = np.cumsum(hist)
+        if cdf[-1] == 0:
+            raise ValueError("no pixel is above od_threshold to estimate stain vectors")
+
+        def percentile(q):
+            rank = q / 100 * cdf[-1]
+            i = min(np.searchsorted(cdf, rank, side="left"), num_bin - 1)
+            below = cdf[i - 1] if i > 0 else 0
+            frac = (rank - below) / hist[i] if hist[i] > 0 else 0.5
+            return -np.pi / 2 + (i + frac) * np.pi / num_bin
+
+        angle_min = percentile(self._param_dict["angle_threshold"].value)
+        angle_max = percentile(100 - self._param_dict["angle_threshold"].value)
+        return self._stain_vector_from_angle(vh, angle_min, angle_max)
+
+    def _stain_vector_from_angle(
+        self, vh: np.ndarray, angle_min: float, angle_max: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
         v1 = np.cos(angle_min) * vh[0, :] + np.sin(angle_min) * vh[1, :]
         v2 = np.cos(angle_max) * vh[0, :] + np.sin(angle_max) * vh[1, :]
-        base = np.array([v1, v2]).T
-        stain_deconv = np.linalg.lstsq(base, od.reshape(-1, 3).T, rcond=None)[0]
+        # hematoxylin is chosen on the vectors as they come out of the
+        # decomposition, as color_deconv always did
         if v1[0] < v2[0]:
-            hemo_idx = 0
-            eosin_idx = 1
-            hemo_vec = v1
-            eosin_vec = v2
+            hemo_vec, eosin_vec = v1, v2
         else:
-            hemo_idx = 1
-            eosin_idx = 0
-            hemo_vec = v2
-            eosin_vec = v1
-        
-        hemo_od = hemo_vec[None, :] * stain_deconv[hemo_idx, :][..., None]
-        eosin_od = eosin_vec[None, :] * stain_deconv[eosin_idx, :][..., None]
-        hemo_rgb = np.exp(-hemo_od).reshape(h, w, c)
-        eosin_rgb = np.exp(-eosin_od).reshape(h, w, c)
-        return (hemo_rgb, eosin_rgb)
+            hemo_vec, eosin_vec = v2, v1
+        # singular vectors have arbitrary sign, keep the optical density
+        # vectors positive so that concentrations are positive as well, od and
+        # rgb outputs do not depend on the sign
+        if hemo_vec.sum() + eosin_vec.sum() < 0:
+            hemo_vec, eosin_vec = -hemo_vec, -eosin_vec
+        return (hemo_vec, eosin_vec)
+
+    def _deconv_od(
+        self,
+        od_flat: np.ndarray,
+        hemo_vec: np.ndarray,
+        eosin_vec: np.ndarray,
+        dtype: np.dtype = np.float64,
+    ) -> Dict[str, StainPair]:
+        modes = self._output_modes()
+        base = np.array([hemo_vec, eosin_vec]).T
+        stain_deconv = np.dot(od_flat, np.linalg.pinv(base).T.astype(dtype, copy=False))
+
+        result = {}
+        if "concentration" in modes:
+            result["concentration"] = (stain_deconv[:, 0], stain_deconv[:, 1])
+        if "od" in modes or "rgb" in modes:
+            hemo_od = hemo_vec.astype(dtype)[None, :] * stain_deconv[:, 0][..., None]
+            eosin_od = eosin_vec.astype(dtype)[None, :] * stain_deconv[:, 1][..., None]
+            if "od" in modes:
+                result["od"] = (hemo_od, eosin_od)
+            if "rgb" in modes:
+                result["rgb"] = (np.exp(-hemo_od), np.exp(-eosin_od))
+        return result
@@ -0,0 +1,134 @@
+import numpy as np
+from typing import Dict, Tuple
+from txgcv.base import Algorithm, Parameter
+
+
+class TissueMask(object):
+    """Low resolution tissue mask of a full resolution image
+
+    Pixel ``(i, j)`` of ``mask`` covers the full resolution pixels
+    ``[i * factor, (i + 1) * factor)`` x ``[j * factor, (j + 1) * factor)``.
+    """
+
+    def __init__(self, mask: np.ndarray, factor: int, shape: Tuple[int, int]) -> None:
+        self.mask = mask
+        self.factor = factor
+        self.shape = tuple(shape[:2])
+
+    @property
+    def tissue_fraction(self) -> float:
+        return float(np.mean(self.mask))
+
+    def region(self, ys: slice, xs: slice) -> np.ndarray:
+        """Low resolution mask covering a full resolution region"""
+        f = self.factor
+        y0, y1, _ = ys.indices(self.shape[0])
+        x0, x1, _ = xs.indices(self.shape[1])
+        return self.mask[y0 // f:-(-y1 // f), x0 // f:-(-x1 // f)]
+
+    def any(self, ys: slice, xs: slice) -> bool:
+        return bool(np.any(self.region(ys, xs)))
+
+    def to_full_resolution(self) -> np.ndarray:
+        f = self.factor
+        full = np.repeat(np.repeat(self.mask, f, axis=0), f, axis=1)
+        return full[: self.shape[0], : self.shape[1]]
+
+
+class TissueDetector(Algorithm):
+    """Fast tissue detection on a downsampled image
+
+    The image is subsampled by ``downsample``, converted to a tissue signal
+    (optical density for bright background such as H&E, intensity for dark
+    background such as fluorescence), thresholded with Otsu's method or a
+    fixed threshold and dilated to keep tissue borders.
+    """
+
+    _param_dict: Dict[str, Parameter] = {
+        "downsample": Parameter(
+            value=16,
+            val_type=int,
+            val_range=[1, np.inf],
+            info="subsampling factor of the image the tissue is detected on",
+        ),
+        "background": Parameter(
+            value="bright",
+            val_type=str,
+            options=["bright", "dark"],
+            info="bright background for brightfield images, dark for fluorescence images",
+        ),
+        "threshold_method": Parameter(
+            value="otsu",
+            val_type=str,
+            options=["otsu", "fixed"],
+            info="threshold the tissue signal with Otsu's method or the fixed threshold",
+        ),
+        "threshold": Parameter(
+            value=0.1,
+            val_type=float,
+            val_range=[0, np.inf],
+            info="fixed threshold of optical density (bright) or normalized intensity (dark)",
+        ),
+        "dilate_radius": Parameter(
+            value=2,
+            val_type=int,
+            val_range=[0, np.inf],
+            info="dilation radius in downsampled pixels applied to the tissue mask",
+        ),
+    }
+
+    def detect(self, img: np.ndarray) -> TissueMask:
+        """Detect tissue of a 2D, HxWxC or CxHxW (C <= 4) image"""
+        if img.ndim == 3 and img.shape[0] <= 4 and img.shape[2] > 4:
+            img = np.moveaxis(img, 0, -1)
+        h, w = img.shape[:2]
+        f = self._param_dict["downsample"].value
+        # strided view, only the sampled pixels of a memory mapped image are read
+        small = np.asarray(img[::f, ::f], dtype=np.float32)
+        if small.ndim == 3:
+            small = small[..., :3]
+
+        max_val = 255.0 if img.dtype == np.uint8 else max(float(np.max(small)), 1e-6)
+        if self._param_dict["background"].value == "bright":
+            signal = -np.log((small * (255.0 / max_val) + 1) / 256)
+        else:
+            signal = small / max_val
+        if signal.ndim == 3:
+            signal = signal.max(axis=2)
+
+        if self._param_dict["threshold_method"].value == "otsu":
+            threshold = otsu_threshold(signal)
+        else:
+            threshold = self._param_dict["threshold"].value
+        mask = signal > threshold
+        mask = binary_dilate(mask, self._param_dict["dilate_radius"].value)
+        return TissueMask(mask, f, (h, w))
+
+
+def otsu_threshold(values: np.ndarray, num_bin: int = 256) -> float:
+    hist, edges = np.histogram(values, bins=num_bin)
+    hist = hist.astype(np.float64)
+    center = (edges[:-1] + edges[1:]) / 2
+    weight_low = np.cumsum(hist)
+    weight_high = weight_low[-1] - weight_low
+    sum_low = np.cumsum(hist * center)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_low = sum_low / weight_low
+        mean_high = (sum_low[-1] - sum_low) / weight_high
+        between = weight_low * weight_high * (mean_low - mean_high) ** 2
+    return float(center[np.nanargmax(between)])
+
+
+def binary_dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    if radius <= 0:
+        return mask
+    out = mask.copy()
+    h, w = mask.shape
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dy * dy + dx * dx > radius * radius:
+                continue
+            out[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] |= mask[
+                max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)
+            ]
+    return out
@@ -1,4 +1,18 @@
 from txgcv.util.path import check_file_exist
-from txgcv.util.io import load
+from txgcv.util.io import load, dump
+from txgcv.util.digest import array_digest, image_digest, param_digest
+from txgcv.util.cache import ImageCache, image_cache
+from txgcv.util.loader import ImageSource, load_image
 
-__all__ = ["check_file_exist", "load"]
\ No newline at end of file
+__all__ = [
+    "check_file_exist",
+    "load",
+    "dump",
+    "array_digest",
+    "image_digest",
+    "param_digest",
+    "ImageCache",
+    "image_cache",
+    "ImageSource",
+    "load_image",
+]
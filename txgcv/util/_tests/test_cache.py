@@ -0,0 +1,68 @@
+import os
+import numpy as np
+from txgcv.util.cache import ImageCache
+
+
+def _files(tmp_path, n):
+    paths = []
+    for i in range(n):
+        path = str(tmp_path / f"img{i}.npy")
+        np.save(path, np.full((10, 10), i, dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def test_cache_hit_reuses_entry(tmp_path):
+    (path,) = _files(tmp_path, 1)
+    cache = ImageCache()
+    loads = []
+
+    def load():
+        loads.append(path)
+        return np.load(path)
+
+    first = cache.get(path, load)
+    assert cache.get(path, load) is first
+    assert cache.get(path, load, "channel", 1) is not first
+    assert len(loads) == 2 and len(cache) == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    paths = _files(tmp_path, 3)
+    cache = ImageCache(max_bytes=250)
+    arrays = [cache.get(path, lambda path=path: np.load(path)) for path in paths[:2]]
+    # the first entry is used again, the second one is dropped for the third
+    assert cache.get(paths[0], lambda: None) is arrays[0]
+    cache.get(paths[2], lambda: np.load(paths[2]))
+    assert len(cache) == 2 and cache.nbytes == 200
+    assert cache.get(paths[0], lambda: None) is arrays[0]
+    assert cache.get(paths[1], lambda: np.load(paths[1])) is not arrays[1]
+
+    # an entry larger than the budget is not kept
+    cache.get(paths[0], lambda: np.zeros(300, dtype=np.uint8), "large")
+    assert cache.nbytes <= 250
+
+
+def test_cache_reopens_rewritten_file(tmp_path):
+    (path,) = _files(tmp_path, 1)
+    cache = ImageCache()
+    first = cache.get(path, lambda: np.load(path))
+    np.save(path, np.zeros((20, 20), dtype=np.uint8))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = cache.get(path, lambda: np.load(path))
+    assert second is not first and second.shape == (20, 20)
+    assert len(cache) == 1
+
+
+def test_cache_discard_and_clear(tmp_path):
+    paths = _files(tmp_path, 2)
+    cache = ImageCache()
+    for path in paths:
+        cache.get(path, lambda path=path: np.load(path))
+        cache.get(path, lambda path=path: np.load(path), "level", 1)
+    cache.discard(paths[0])
+    assert len(cache) == 2
+    assert cache.get(paths[1], lambda: None) is not None
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import tifffile
+from txgcv.util.tiff import TiffLevel, tiff_levels
+
+
+@pytest.fixture
+def rgb_tiff(tmp_path):
+    # compressed, tiled RGB TIFF with a half resolution sub level
+    img = np.random.default_rng(0).integers(0, 256, (100, 120, 3), dtype=np.uint8)
+    path = str(tmp_path / "rgb.tif")
+    with tifffile.TiffWriter(path) as tiff:
+        tiff.write(img, tile=(32, 32), compression="zlib", subifds=1, photometric="rgb")
+        tiff.write(img[::2, ::2], tile=(32, 32), compression="zlib", subfiletype=1)
+    return (path, np.moveaxis(img, -1, 0))
+
+
+def test_slicing_matches_array(rgb_tiff):
+    path, img = rgb_tiff
+    level = TiffLevel(path)
+    assert level.shape == img.shape
+    assert level.dtype == np.uint8
+    np.testing.assert_array_equal(np.asarray(level), img)
+    np.testing.assert_array_equal(level[:, 10:50, 33:97], img[:, 10:50, 33:97])
+    np.testing.assert_array_equal(level[1, 5, ::3], img[1, 5, ::3])
+    np.testing.assert_array_equal(level[..., -1], img[..., -1])
+    with pytest.raises(IndexError):
+        level[:, 100]
+    level.close()
+
+
+def test_channel_view_shares_file(rgb_tiff):
+    path, img = rgb_tiff
+    level = TiffLevel(path)
+    channel = level[2]
+    assert isinstance(channel, TiffLevel)
+    assert channel._tiff is level._tiff
+    assert channel.shape == img.shape[1:]
+    np.testing.assert_array_equal(channel[20:40, :], img[2, 20:40])
+    np.testing.assert_array_equal(level[..., :10], img[..., :10])
+    level.close()
+
+
+def test_levels(rgb_tiff):
+    path, img = rgb_tiff
+    levels = tiff_levels(path)
+    assert [level.shape for level in levels] == [img.shape, img[:, ::2, ::2].shape]
+    np.testing.assert_array_equal(levels[1][...], img[:, ::2, ::2])
+    for level in levels:
+        level.close()
@@ -0,0 +1,78 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+
+
+class ImageCache(object):
+    """Process-wide LRU cache of opened images
+
+    Entries are keyed by the absolute path and extra key parts, and are only
+    valid for the modification time and size the file had when it was
+    opened, so a rewritten file is opened again. Entries report the bytes
+    they hold in memory through an ``nbytes`` attribute, which may grow after
+    insertion (e.g. a decoded level kept by the entry). Whenever the total
+    exceeds ``max_bytes`` the least recently used entries are dropped.
+    Memory mapped data costs nothing against the budget.
+    """
+
+    def __init__(self, max_bytes: int = 4 * 2**30) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(_nbytes(entry) for _, entry in self._entries.values())
+
+    def get(self, path: str, load: Callable[[], Any], *key_parts: Hashable) -> Any:
+        """Cached entry of ``path``, opened by ``load()`` if missing or stale"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path,) + key_parts
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(key)
+                self._evict()
+                return cached[1]
+        # opened outside the lock, concurrent misses of one file may both
+        # open it and the last one is kept
+        entry = load()
+        with self._lock:
+            self._entries[key] = (version, entry)
+            self._entries.move_to_end(key)
+            self._evict()
+        return entry
+
+    def discard(self, path: str) -> None:
+        """Drop every entry of ``path``"""
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        # the most recently used entry goes last, even if it alone exceeds
+        # the budget it is dropped so the cache never pins it
+        total = sum(_nbytes(entry) for _, entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 0:
+            _, (_, entry) = self._entries.popitem(last=False)
+            total -= _nbytes(entry)
+
+
+def _nbytes(entry: Any) -> int:
+    return int(getattr(entry, "nbytes", 0))
+
+
+# shared by the plugin widgets and the headless APIs of the process
+image_cache = ImageCache()
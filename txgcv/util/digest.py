@@ -0,0 +1,90 @@
+import os
+import json
+import mmap
+import hashlib
+import numpy as np
+from typing import Any, Dict
+
+
+def array_digest(arr: np.ndarray, chunk_rows: int = 256) -> str:
+    """Content digest of an array including its shape and dtype.
+
+    The array is hashed in chunks of rows so that memory mapped or
+    non-contiguous arrays are never copied as a whole.
+    """
+    arr = np.asanyarray(arr)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((arr.shape, arr.dtype.str)).encode())
+    if arr.ndim == 0:
+        h.update(arr.tobytes())
+    else:
+        for start in range(0, arr.shape[0], chunk_rows):
+            h.update(np.ascontiguousarray(arr[start:start + chunk_rows]).tobytes())
+    return h.hexdigest()
+
+
+def image_digest(arr: np.ndarray, num_sample_rows: int = 64) -> str:
+    """Digest of an image which does not read memory mapped files as a whole
+
+    Arrays backed by a file memory map are identified by the file path,
+    size and modification time, the position, shape and strides of the view
+    into the file, and the content of ``num_sample_rows`` rows spread over
+    the array. Other arrays get their full :func:`array_digest`.
+    """
+    mapped = _file_memmap(arr)
+    if mapped is None or arr.ndim == 0:
+        return array_digest(arr)
+    stat = os.stat(mapped.filename)
+    offset = arr.__array_interface__["data"][0] - mapped.__array_interface__["data"][0]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(
+        str(
+            (
+                os.path.abspath(mapped.filename),
+                stat.st_size,
+                stat.st_mtime_ns,
+                mapped.offset + offset,
+                arr.shape,
+                arr.strides,
+                arr.dtype.str,
+            )
+        ).encode()
+    )
+    rows = np.unique(np.linspace(0, arr.shape[0] - 1, num_sample_rows).round().astype(int))
+    for row in rows:
+        h.update(np.ascontiguousarray(arr[row]).tobytes())
+    return h.hexdigest()
+
+
+def _file_memmap(arr: np.ndarray) -> np.memmap:
+    # the memory map directly on top of the mapped file, if arr is a view of one
+    while isinstance(arr, np.ndarray):
+        if (
+            isinstance(arr, np.memmap)
+            and isinstance(arr.base, mmap.mmap)
+            and getattr(arr, "filename", None) is not None
+        ):
+            return arr
+        arr = arr.base
+    return None
+
+
+def _to_builtin(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def param_digest(param_dict: Dict[str, Any]) -> str:
+    """Canonical digest of a parameter dictionary.
+
+    Values may be :class:`txgcv.base.Parameter` objects, in which case only
+    their current value participates in the digest.
+    """
+    values = {
+        key: getattr(val, "value", val) for key, val in param_dict.items()
+    }
+    text = json.dumps(values, sort_keys=True, default=_to_builtin)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
@@ -36,3 +36,38 @@ def load(file, file_format=None, **kwargs):
     else:
         raise TypeError('"file" must be a filepath str or a file-object')
     return obj
+
+
+def dump(obj, file=None, file_format=None, **kwargs):
+    """Dump data to json/yaml strings or files.
+
+    This method provides a unified api for dumping data as strings or to files,
+    and also supports custom arguments for each file format.
+
+    Args:
+        obj (any): The python object to be dumped.
+        file (str or file-like object, optional): If not specified, then the
+            object is dump to a str, otherwise to a file specified by the
+            filename or file-like object.
+        file_format (str, optional): Same as :func:`load`.
+
+    Returns:
+        str or None: The dumped string if ``file`` is not given.
+    """
+    if file_format is None:
+        if isinstance(file, str):
+            file_format = file.split('.')[-1]
+        elif file is None:
+            raise ValueError('file_format must be specified since file is None')
+    if file_format not in file_handlers:
+        raise TypeError('Unsupported format: {}'.format(file_format))
+
+    handler = file_handlers[file_format]
+    if file is None:
+        return handler.dump_to_str(obj, **kwargs)
+    elif isinstance(file, str):
+        handler.dump_to_path(obj, file, **kwargs)
+    elif hasattr(file, 'write'):
+        handler.dump_to_fileobj(obj, file, **kwargs)
+    else:
+        raise TypeError('"file" must be a filename str or a file-object')
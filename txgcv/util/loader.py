@@ -0,0 +1,164 @@
+import mmap
+import numpy as np
+from typing import Any, List, Tuple
+from txgcv.util.cache import image_cache
+
+
+class ImageSource(object):
+    """Image opened without decoding it as a whole
+
+    ``levels`` are the resolution levels, full resolution first, as channel
+    first (CxHxW) or HxW array-likes: views of memory maps or of a decoded
+    array, or :class:`txgcv.util.tiff.TiffLevel` for compressed TIFFs.
+    ``scale`` maps the intensities to [0, 255] like the former
+    ``255 * img / np.max(img)``, but it is taken from the metadata or a
+    sample and applied only when :meth:`normalized` is called.
+    """
+
+    def __init__(self, path: str, levels: List[Any], scale: float) -> None:
+        self.path = path
+        self.levels = levels
+        self.scale = scale
+        self._normalized = {}
+
+    @property
+    def data(self) -> Any:
+        return self.levels[0]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(self.data.shape)
+
+    @property
+    def multiscale(self) -> bool:
+        return len(self.levels) > 1
+
+    @property
+    def layer_data(self) -> Any:
+        """Data of a napari image layer, a list of levels if multiscale"""
+        return self.levels if self.multiscale else self.data
+
+    @property
+    def contrast_limits(self) -> Tuple[float, float]:
+        """Contrast limits showing the raw data as normalized to [0, 255]"""
+        return (0.0, 255.0 / self.scale)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory, memory mapped and lazily read levels excluded"""
+        arrays = {id(arr): arr for arr in self.levels + list(self._normalized.values())}
+        return sum(arr.nbytes for arr in arrays.values() if _in_memory(arr))
+
+    def normalized(self, level: int = 0) -> np.ndarray:
+        """Level scaled to [0, 255]
+
+        Returns the level itself, memory mapped or not, if it needs no
+        scaling, otherwise a float32 copy made once and kept, which must not
+        be modified.
+        """
+        if level not in self._normalized:
+            img = self.levels[level]
+            if self.scale != 1:
+                img = np.multiply(img, self.scale, dtype=np.float32)
+            self._normalized[level] = np.asarray(img)
+        return self._normalized[level]
+
+
+def load_image(path: str, series: int = 0, cache: bool = True) -> ImageSource:
+    """Open an image for display and processing
+
+    ``.npy`` files and uncompressed TIFF levels are memory mapped, compressed
+    TIFF levels are read tile by tile on access, and other formats are decoded
+    once through skimage. Channel last images are turned channel first by a
+    view, never a copy.
+
+    Args:
+        path (str): image file.
+        series (int): TIFF series, e.g. of a multi image OME-TIFF.
+        cache (bool): share the opened image, and its normalized levels once
+            computed, through the process-wide :data:`image_cache` until the
+            file changes.
+
+    Returns:
+        The opened image.
+    """
+    if cache:
+        return image_cache.get(path, lambda: load_image(path, series, cache=False), series)
+    lower = path.lower()
+    if lower.endswith(".npy"):
+        levels, max_value = [_channel_first(np.load(path, mmap_mode="r"))], None
+    elif lower.endswith((".tif", ".tiff", ".svs", ".ndpi")):
+        levels, max_value = _tiff_levels(path, series)
+    else:
+        from skimage import io
+
+        levels, max_value = [_channel_first(io.imread(path))], None
+    if max_value is None:
+        max_value = _max_value(levels)
+    scale = 255.0 / max_value if max_value > 0 else 1.0
+    return ImageSource(path, levels, scale)
+
+
+def _tiff_levels(path: str, series: int) -> Tuple[List[Any], float]:
+    import tifffile
+    from txgcv.util.tiff import TiffLevel
+
+    levels = []
+    with tifffile.TiffFile(path) as tiff:
+        tiff_series = tiff.series[series]
+        page = tiff_series.levels[0].pages[0]
+        # a MaxSampleValue below the dtype range, e.g. 4095 of 12 bit data in
+        # uint16, is the intensity range, 8 bit data is taken as is
+        tag = page.tags.get("MaxSampleValue")
+        max_value = None
+        if tag is not None and np.issubdtype(page.dtype, np.integer):
+            value = int(np.max(tag.value))
+            if 0 < value < np.iinfo(page.dtype).max:
+                max_value = float(value)
+        if max_value is None and page.dtype == np.uint8:
+            max_value = 255.0
+        for level, tiff_level in enumerate(tiff_series.levels):
+            if tiff_level.dataoffset is not None:
+                img = tifffile.memmap(path, series=series, level=level, mode="r")
+                if tiff_level.axes.endswith("S"):
+                    img = np.moveaxis(img, -1, 0)
+                levels.append(img)
+            else:
+                levels.append(TiffLevel(path, level, series))
+    return (levels, max_value)
+
+
+def _channel_first(img: np.ndarray) -> np.ndarray:
+    # HxWxC with up to 4 channels (gray alpha, RGB, RGBA) becomes a CxHxW view
+    if img.ndim == 3 and img.shape[2] <= 4 < img.shape[0]:
+        return np.moveaxis(img, -1, 0)
+    return img
+
+
+def _max_value(
+    levels: List[Any], max_pixels: int = 2**22, num_window: int = 4, window: int = 512
+) -> float:
+    # maximum of the coarsest level if small, otherwise of a grid of windows,
+    # an approximation of the maximum which never reads the whole image
+    img = levels[-1]
+    h, w = img.shape[-2:]
+    if h * w <= max_pixels:
+        samples = [np.asarray(img[...])]
+    else:
+        samples = [
+            np.asarray(img[..., y:y + window, x:x + window])
+            for y in np.linspace(0, max(h - window, 0), num_window).astype(int)
+            for x in np.linspace(0, max(w - window, 0), num_window).astype(int)
+        ]
+    return float(max(np.nanmax(sample) for sample in samples))
+
+
+def _in_memory(arr: Any) -> bool:
+    # decoded arrays and views of them, not memory maps or lazy array-likes
+    if not isinstance(arr, np.ndarray):
+        return False
+    while isinstance(arr, np.ndarray):
+        if isinstance(arr, np.memmap):
+            return False
+        arr = arr.base
+    return not isinstance(arr, mmap.mmap)
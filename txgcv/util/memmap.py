@@ -0,0 +1,23 @@
+import os
+import numpy as np
+from typing import Any, Union
+
+
+def spill_array(img: Union[str, np.ndarray], directory: str, name: str) -> str:
+    """Return a path other processes can memory map ``img`` from.
+
+    Paths are passed through, arrays are saved as ``<directory>/<name>.npy``.
+    """
+    if isinstance(img, str):
+        return img
+    path = os.path.join(directory, f"{name}.npy")
+    np.save(path, np.asarray(img))
+    return path
+
+
+def open_image(path: str) -> Any:
+    """Full resolution, channel first level of an image file without
+    normalization, memory mapped where possible (see :func:`load_image`)."""
+    from txgcv.util.loader import load_image
+
+    return load_image(path).data
@@ -0,0 +1,188 @@
+import threading
+import numpy as np
+from typing import Any, List, Tuple
+
+
+class TiffLevel(object):
+    """Array-like of one level of a (pyramidal) TIFF file
+
+    Slicing reads and decodes only the tiles or strips overlapping the
+    requested region, so levels far larger than memory can be sliced.
+    Multi sample (e.g. RGB) levels are presented channel first, CxHxW, like
+    the images :class:`txgcv.registration.ImageRegister` takes. Indexing a
+    single channel returns a lazy channel view.
+    """
+
+    def __init__(self, path: str, level: int = 0, series: int = 0, channel: int = None) -> None:
+        import tifffile
+
+        self.path = path
+        self.level = level
+        self.series = series
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._tiff = tifffile.TiffFile(path)
+        self._page = self._tiff.series[series].levels[level].pages[0]
+        page = self._page
+        if page.planarconfig not in (1, 2):
+            raise ValueError(f"unsupported planar configuration {page.planarconfig}")
+        self._height = page.imagelength
+        self._width = page.imagewidth
+        self._samples = page.samplesperpixel
+        if page.is_tiled:
+            self._chunk = (page.tilelength, page.tilewidth)
+        else:
+            self._chunk = (min(page.rowsperstrip, self._height), self._width)
+        self._grid = (
+            -(-self._height // self._chunk[0]),
+            -(-self._width // self._chunk[1]),
+        )
+
+    def __getstate__(self) -> dict:
+        # the file is reopened after unpickling, e.g. in a worker process
+        return {
+            "path": self.path,
+            "level": self.level,
+            "series": self.series,
+            "channel": self.channel,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def close(self) -> None:
+        """Close the file, which is shared with the channel views"""
+        self._tiff.close()
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        if self._samples > 1 and self.channel is None:
+            return (self._samples, self._height, self._width)
+        return (self._height, self._width)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._page.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype: np.dtype = None, copy: bool = None) -> np.ndarray:
+        arr = self[...]
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+
+    def __getitem__(self, key: Any) -> Any:
+        key = _expand_key(key, self.ndim)
+        if self.ndim == 3:
+            channel_key, y_key, x_key = key
+            if isinstance(channel_key, (int, np.integer)) and _is_full(y_key) and _is_full(x_key):
+                # the view shares the open file, page and lock of the level,
+                # copy.copy would reopen the file through __setstate__
+                view = object.__new__(TiffLevel)
+                view.__dict__.update(self.__dict__, channel=int(channel_key))
+                return view
+        else:
+            channel_key = None
+            y_key, x_key = key
+        y_slice, y_squeeze = _as_slice(y_key, self._height)
+        x_slice, x_squeeze = _as_slice(x_key, self._width)
+        y0, y1, _ = y_slice.indices(self._height)
+        x0, x1, _ = x_slice.indices(self._width)
+        region = self.read_region(y0, max(y1, y0), x0, max(x1, x0))
+        region = region[..., :: y_slice.step or 1, :: x_slice.step or 1]
+        if y_squeeze:
+            region = region[..., 0, :]
+        if x_squeeze:
+            region = region[..., 0]
+        if channel_key is not None:
+            region = region[channel_key]
+        return region
+
+    def read_region(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """Decode the region ``[y0, y1) x [x0, x1)`` as HxW or CxHxW"""
+        page = self._page
+        samples = self._samples
+        out = np.zeros((y1 - y0, x1 - x0, samples), dtype=self.dtype)
+        tl, tw = self._chunk
+        ny, nx = self._grid
+        planes = samples if page.planarconfig == 2 else 1
+        if y1 <= y0 or x1 <= x0:
+            planes = 0
+        for plane in range(planes):
+            for ty in range(y0 // tl, -(-y1 // tl)):
+                for tx in range(x0 // tw, -(-x1 // tw)):
+                    index = plane * ny * nx + ty * nx + tx
+                    segment = self._read_segment(index)
+                    if segment is None:
+                        continue  # sparse file, missing chunks are zero
+                    segment = segment.reshape(segment.shape[-3:])
+                    sy0, sx0 = ty * tl, tx * tw
+                    cy0, cy1 = max(y0, sy0), min(y1, sy0 + tl, self._height)
+                    cx0, cx1 = max(x0, sx0), min(x1, sx0 + tw, self._width)
+                    sample = slice(None) if planes == 1 else slice(plane, plane + 1)
+                    out[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0, sample] = segment[
+                        cy0 - sy0:cy1 - sy0, cx0 - sx0:cx1 - sx0
+                    ]
+        if samples == 1:
+            return out[..., 0]
+        out = np.moveaxis(out, -1, 0)
+        if self.channel is not None:
+            return out[self.channel]
+        return out
+
+    def _read_segment(self, index: int) -> np.ndarray:
+        page = self._page
+        offset, bytecount = page.dataoffsets[index], page.databytecounts[index]
+        if bytecount == 0:
+            return None
+        with self._lock:
+            fh = self._tiff.filehandle
+            fh.seek(offset)
+            data = fh.read(bytecount)
+        segment, _, _ = page.decode(data, index, jpegtables=page.jpegtables)
+        return segment
+
+
+def tiff_levels(path: str, series: int = 0) -> List[TiffLevel]:
+    """All resolution levels of a TIFF series, full resolution first"""
+    import tifffile
+
+    with tifffile.TiffFile(path) as tiff:
+        num_level = len(tiff.series[series].levels)
+    return [TiffLevel(path, level, series) for level in range(num_level)]
+
+
+def _expand_key(key: Any, ndim: int) -> Tuple[Any, ...]:
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        i = next(i for i, k in enumerate(key) if k is Ellipsis)
+        key = key[:i] + (slice(None),) * (ndim - len(key) + 1) + key[i + 1:]
+    if len(key) > ndim:
+        raise IndexError(f"too many indices for a {ndim} dimensional level")
+    return key + (slice(None),) * (ndim - len(key))
+
+
+def _is_full(key: Any) -> bool:
+    return isinstance(key, slice) and key == slice(None)
+
+
+def _as_slice(key: Any, size: int) -> Tuple[slice, bool]:
+    if isinstance(key, (int, np.integer)):
+        key = int(key) + size if key < 0 else int(key)
+        if not 0 <= key < size:
+            raise IndexError(f"index {key} is out of bounds for size {size}")
+        return (slice(key, key + 1), True)
+    if isinstance(key, slice):
+        if key.step is not None and key.step < 0:
+            raise IndexError("negative steps are not supported")
+        return (key, False)
+    raise IndexError(f"unsupported index {key}")